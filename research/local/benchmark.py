@@ -0,0 +1,292 @@
+import sqlite3
+import json
+import os
+import sys
+import time
+import random
+import argparse
+import platform
+import subprocess
+import statistics
+import contextlib
+import io
+import tempfile
+from datetime import datetime, timezone
+
+import generator
+from generator import (factor_block, is_prime, get_divisors, set_size, graph_descriptors,
+                       compute_record, generate_data, vectorized, vector_block, vector_records)
+
+MAGNITUDES = [3, 4, 5, 6, 7]  # Generator runs start at 10^k for each k
+GENERATE_ROWS = 20000  # n generated per magnitude
+STAGE_REPEAT = 3  # Stage timings report the best of this many passes
+FIXTURE_ROWS = 200000  # Fixture database for the server benchmarks: n in [4, 4 + FIXTURE_ROWS)
+FIXTURE_DIR = "bench_fixtures"
+REQUESTS = 200  # Requests per query shape
+GRAPH_SAMPLE_MAX = 20000  # /api/graph is sampled from n below this (bigger graphs are slow to draw anyway)
+SEED = 1234
+
+def quiet():
+    """Swallows the generator's progress prints."""
+    return contextlib.redirect_stdout(io.StringIO())
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def distribution(samples):
+    """Latency summary in milliseconds."""
+    ms = sorted(s * 1000 for s in samples)
+    def pct(p):
+        return round(ms[min(len(ms) - 1, int(p / 100 * len(ms)))], 4)
+    return {
+        "count": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "min_ms": round(ms[0], 4),
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p99_ms": pct(99),
+        "max_ms": round(ms[-1], 4),
+    }
+
+# ---------------------------------------------------------
+# Generator
+# ---------------------------------------------------------
+
+def best_of(repeat, fn):
+    """Fastest of `repeat` runs of fn(), in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def set_sizes(n, factorization):
+    """The set-size half of compute_record(): set_size() of both sides of every a * b = n."""
+    primes = [p for p, _ in factorization]
+    for a in get_divisors(factorization)[-2:0:-1]:
+        b = n // a
+        if a < b: break
+        set_size(n, a, primes)
+        set_size(n, b, primes)
+
+def bench_stages(lo, hi, repeat):
+    """Seconds per stage of computing the rows for [lo, hi), each timed on its own."""
+    factorizations = factor_block(lo, hi)
+    ns = list(zip(range(lo, hi), factorizations))
+    composites = [(n, f) for n, f in ns if not is_prime(f)]
+    graphs = [graph_descriptors(n, f) for n, f in composites]
+    timings = {
+        "factor_block": best_of(repeat, lambda: factor_block(lo, hi)),
+        "is_prime": best_of(repeat, lambda: [is_prime(f) for f in factorizations]),
+        "get_divisors": best_of(repeat, lambda: [get_divisors(f) for _, f in composites]),
+        "set_sizes": best_of(repeat, lambda: [set_sizes(n, f) for n, f in composites]),
+        "json_encode": best_of(repeat, lambda: [json.dumps(g, separators=(",", ":")) for g in graphs]),
+        "compute_record": best_of(repeat, lambda: [compute_record(n, f) for n, f in ns]),
+    }
+    if vectorized(lo, hi):
+        timings["vector_block"] = best_of(repeat, lambda: vector_block(lo, hi))
+        timings["vector_records"] = best_of(repeat, lambda: vector_records(lo, hi))
+    return {stage: {"seconds": round(sec, 6), "ns_per_n": round(sec / (hi - lo) * 1e9, 1)}
+            for stage, sec in timings.items()}
+
+def bench_generate(magnitudes, rows, repeat, workers, ingest):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for k in magnitudes:
+            lo = max(4, 10 ** k)
+            hi = lo + rows
+            print(f"generate_data: n in [{lo}, {hi})")
+            db_name = os.path.join(tmp, f"gen_{k}.db")
+            start = time.perf_counter()
+            with quiet():
+                generate_data(workers=workers, ingest=ingest, db_name=db_name, start_n=lo, end_n=hi)
+            elapsed = time.perf_counter() - start
+            os.remove(db_name)
+            results.append({
+                "magnitude": k,
+                "start_n": lo,
+                "rows": rows,
+                "seconds": round(elapsed, 4),
+                "rows_per_sec": round(rows / elapsed, 1),
+                "stages": bench_stages(lo, hi, repeat),
+            })
+            print(f"  {rows / elapsed:,.0f} rows/sec")
+    return results
+
+# ---------------------------------------------------------
+# Server
+# ---------------------------------------------------------
+
+def fixture_db(rows, fixture_dir):
+    """Path of a generated database with n in [4, 4 + rows), built on first use and reused after."""
+    os.makedirs(fixture_dir, exist_ok=True)
+    path = os.path.join(fixture_dir, f"graph_data_4_{4 + rows}.db")
+    if os.path.exists(path):
+        conn = sqlite3.connect(path)
+        count = conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+        conn.close()
+        if count == rows:
+            return path
+    print(f"Building fixture database {path}...")
+    with quiet():
+        generate_data(ingest=True, db_name=path, start_n=4, end_n=4 + rows)
+    return path
+
+def query_shapes(client, rows):
+    """The search URLs to time, with the component queries taken from the fixture's own facets
+    so every shape has matches."""
+    def top(kind):
+        facets = client.get(f"/api/stats/facets?kind={kind}&limit=1").get_json()["facets"]
+        return facets[0]["signature"] if facets else None
+
+    c_sig, k_sig = top("C"), top("K")
+    c_size = c_sig[3:-1] if c_sig else "1"
+    low, high = k_sig[3:-1].split(",") if k_sig else ("1", "2")
+    return {
+        "empty": "/api/search",
+        "exact_c": f"/api/search?q={c_size}",
+        "full_k": f"/api/search?q=({low},{high})",
+        "partial_k": f"/api/search?q=({high},",
+        "deep_offset": f"/api/search?offset={rows // 2}",
+        "deep_offset_k": f"/api/search?q=({high},&offset=1000",
+        "boolean": f"/api/search?q=({c_size} OR ({low},{high})), NOT ({high},, w < {rows // 2}",
+        "range": "/api/search?q=2x(*,*), count >= 3",
+    }
+
+def timed_get(client, url):
+    start = time.perf_counter()
+    resp = client.get(url)
+    elapsed = time.perf_counter() - start
+    if resp.status_code != 200:
+        raise RuntimeError(f"{url} returned {resp.status_code}")
+    return elapsed
+
+def bench_server(rows, fixture_dir, requests):
+    path = fixture_db(rows, fixture_dir)
+    import server
+    server.db_pool = server.ConnectionPool(path, server.POOL_SIZE)
+    client = server.app.test_client()
+
+    results = {"fixture": {"path": path, "rows": rows}, "search": {}, "graph": {}}
+    for shape, url in query_shapes(client, rows).items():
+        print(f"{shape}: {url}")
+        timed_get(client, url)  # Warm the pool and the page cache
+        cold = []
+        for _ in range(requests):
+            server.result_cache.entries.clear()
+            cold.append(timed_get(client, url))
+        cached = [timed_get(client, url) for _ in range(requests)]
+        results["search"][shape] = {"url": url, "uncached": distribution(cold), "cached": distribution(cached)}
+        print(f"  p50 {results['search'][shape]['uncached']['p50_ms']} ms uncached, "
+              f"{results['search'][shape]['cached']['p50_ms']} ms cached")
+
+    rng = random.Random(SEED)
+    high = min(4 + rows, GRAPH_SAMPLE_MAX)
+    with server.db_pool.connection() as conn:
+        composites = [r[0] for r in conn.execute("SELECT n FROM records WHERE is_prime = 0 AND n < ?", (high,))]
+    sample = [rng.choice(composites) for _ in range(requests)]
+    cold = []
+    for n in sample:
+        with server.graph_cache.lock:
+            server.graph_cache.entries.clear()
+            server.graph_cache.edges = 0
+        cold.append(timed_get(client, f"/api/graph/{n}"))
+    for n in sample:
+        timed_get(client, f"/api/graph/{n}")
+    cached = [timed_get(client, f"/api/graph/{n}") for n in sample]
+    results["graph"] = {"sample_below": high, "uncached": distribution(cold), "cached": distribution(cached)}
+    print(f"graph: p50 {results['graph']['uncached']['p50_ms']} ms uncached, "
+          f"{results['graph']['cached']['p50_ms']} ms cached")
+    return results
+
+# ---------------------------------------------------------
+# Comparing runs
+# ---------------------------------------------------------
+
+def flatten(results, prefix=""):
+    """{"a.b.c": number} for every number that's a metric worth comparing."""
+    flat = {}
+    if isinstance(results, dict):
+        for key, value in results.items():
+            flat.update(flatten(value, f"{prefix}{key}."))
+    elif isinstance(results, list):
+        for i, item in enumerate(results):
+            label = item.get("magnitude", i) if isinstance(item, dict) else i
+            flat.update(flatten(item, f"{prefix}{label}."))
+    elif isinstance(results, (int, float)) and not isinstance(results, bool):
+        name = prefix[:-1]
+        if name.endswith(("_ms", "seconds", "ns_per_n", "rows_per_sec")):
+            flat[name] = results
+    return flat
+
+def compare(old_path, new_path):
+    """Prints every metric of two result files side by side with the change in percent."""
+    with open(old_path) as f:
+        old = flatten(json.load(f)["results"])
+    with open(new_path) as f:
+        new = flatten(json.load(f)["results"])
+    for name in sorted(old.keys() & new.keys()):
+        before, after = old[name], new[name]
+        change = (after - before) / before * 100 if before else 0.0
+        # rows_per_sec is the only metric where bigger is better
+        worse = change < 0 if name.endswith("rows_per_sec") else change > 0
+        flag = " !" if worse and abs(change) >= 10 else ""
+        print(f"{name:60} {before:>14} {after:>14} {change:+8.1f}%{flag}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark generator throughput and server latency.")
+    parser.add_argument("--only", choices=["generate", "server"],
+                        help="run just one half of the suite")
+    parser.add_argument("--magnitudes", default=",".join(map(str, MAGNITUDES)),
+                        help=f"comma separated k; generation is timed from n = 10^k (default: {','.join(map(str, MAGNITUDES))})")
+    parser.add_argument("--rows", type=int, default=GENERATE_ROWS,
+                        help=f"n generated per magnitude (default: {GENERATE_ROWS})")
+    parser.add_argument("--repeat", type=int, default=STAGE_REPEAT,
+                        help=f"stage timings keep the best of this many passes (default: {STAGE_REPEAT})")
+    parser.add_argument("--workers", type=int, default=1, help="passed to generate_data (default: 1)")
+    parser.add_argument("--ingest", action="store_true", help="time generate_data in --ingest mode")
+    parser.add_argument("--fixture-rows", type=int, default=FIXTURE_ROWS,
+                        help=f"rows in the server fixture database (default: {FIXTURE_ROWS})")
+    parser.add_argument("--fixture-dir", default=FIXTURE_DIR,
+                        help=f"where fixture databases are built and reused (default: {FIXTURE_DIR})")
+    parser.add_argument("--requests", type=int, default=REQUESTS,
+                        help=f"requests per query shape (default: {REQUESTS})")
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="file the JSON results are written to (default: benchmark_results.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="print the change between two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit()
+
+    results = {}
+    if args.only in (None, "generate"):
+        magnitudes = [int(k) for k in args.magnitudes.split(",")]
+        results["generate"] = bench_generate(magnitudes, args.rows, args.repeat, args.workers, args.ingest)
+    if args.only in (None, "server"):
+        results["server"] = bench_server(args.fixture_rows, args.fixture_dir, args.requests)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+            "graph_threshold": generator.GRAPH_THRESHOLD,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"Results written to {args.output}")
@@ -1,11 +1,54 @@
 import sqlite3
 import math
 import json
+import re
 import signal
 import sys
+import os
 import time
+import argparse
+import multiprocessing
+import functools
+from collections import Counter, deque
+from itertools import chain
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import numpy as np
+except ImportError:  # Optional: rows past GRAPH_THRESHOLD are computed one n at a time without it
+    np = None
 
 DB_NAME = "graph_data.db"
+GRAPH_THRESHOLD = 50000  # Only store graph descriptors for n < this
+SIEVE_BLOCK = 10000  # n values factored per segmented sieve pass
+VECTOR_BLOCK = 100000  # n values per NumPy engine call
+VECTOR_MAX_ROOT = 2_000_000  # The NumPy engine holds arrays of every b <= sqrt(n), so past this it's the pure Python path
+BATCH_SIZE = 100
+TRIAL_DIVISION_LIMIT = 1000  # factorize() strips primes up to this before Pollard's rho
+COMPUTE_CACHE_SIZE = 4096  # Single-n factorizations and rows kept by factorize() / compute_n()
+INDEXES = {
+    "idx_prime": "records (is_prime)",
+    # Exact C_{m} / K_{x,y} lookups and partial K_{x,*} on the low side, seekable on n
+    "idx_comp_low": "components (kind, low, high, n)",
+    # Partial K_{*,y} on the high side
+    "idx_comp_high": "components (kind, high, n)",
+    # Signature counts over a range of blocks, for the analytics facets
+    "idx_postings_block": "postings (block, sig, count)",
+}
+COMPONENT_RE = re.compile(r"([CK])_\{(\d+)(?:,(\d+))?\}")
+POSTINGS_BLOCK = 10000  # n values per postings segment
+ANY_COMPLETE = "C_*"  # Postings key for "has at least one C_{m}"
+# --ingest: commit once either limit is hit instead of every BATCH_SIZE rows
+INGEST_COMMIT_ROWS = 50000
+INGEST_COMMIT_SECONDS = 5.0
+COLUMNAR_FILE_ROWS = 250000  # --format parquet/arrow: rows per file
+PROGRESS_WINDOW_SECONDS = 30.0  # rows/sec in the status is averaged over this long
+STATUS_FILE = "status.json"  # --format parquet/arrow: the status sidecar in the output directory
+STATUS_FILE_SECONDS = 1.0  # ... rewritten at most this often
 running = True
 
 def signal_handler(sig, frame):
@@ -13,34 +56,386 @@ def signal_handler(sig, frame):
     print("\nStopping generator... finishing current batch.")
     running = False
 
-signal.signal(signal.SIGINT, signal_handler)
-
-def get_factors(n):
-    """Returns factors of n excluding 1 and n, sorted descending."""
-    factors = []
-    for i in range(2, int(math.isqrt(n)) + 1):
-        if n % i == 0:
-            factors.append(i)
-            if i*i != n:
-                factors.append(n // i)
-    factors.sort(reverse=True)
-    return factors
-
-def is_prime(n):
-    if n <= 1: return False
-    if n <= 3: return True
-    if n % 2 == 0 or n % 3 == 0: return False
-    i = 5
-    while i * i <= n:
-        if n % i == 0 or n % (i + 2) == 0: return False
-        i += 6
+def small_primes(limit):
+    """Returns all primes <= limit using a plain sieve of Eratosthenes."""
+    sieve = bytearray([1]) * (limit + 1)
+    sieve[:2] = b"\x00\x00"[:limit + 1]
+    for i in range(2, math.isqrt(limit) + 1):
+        if sieve[i]:
+            sieve[i*i::i] = bytearray(len(range(i*i, limit + 1, i)))
+    return [i for i in range(limit + 1) if sieve[i]]
+
+def factor_block(lo, hi):
+    """Factors every n in [lo, hi) with one segmented sieve pass.
+    Entry n - lo of the result is the prime factorization of n as [(p, e), ...]."""
+    residual = list(range(lo, hi))
+    factorizations = [[] for _ in range(hi - lo)]
+    for p in small_primes(math.isqrt(hi - 1)):
+        for m in range(-(-lo // p) * p, hi, p):
+            i = m - lo
+            e = 0
+            while residual[i] % p == 0:
+                residual[i] //= p
+                e += 1
+            factorizations[i].append((p, e))
+    # Whatever is left after removing every prime <= sqrt(hi) is itself prime
+    for i, r in enumerate(residual):
+        if r > 1:
+            factorizations[i].append((r, 1))
+    return factorizations
+
+def get_divisors(factorization):
+    """Returns every divisor of n (including 1 and n) from its factorization, sorted ascending."""
+    divisors = [1]
+    for p, e in factorization:
+        divisors = [d * p**k for d in divisors for k in range(e + 1)]
+    divisors.sort()
+    return divisors
+
+def set_size(n, f, primes):
+    """Size of f's set of multiples for n, without building it.
+
+    Walking divisors largest first, a multiple m < n lands in f's set exactly when
+    gcd(m, n) == f, so inclusion-exclusion over the larger divisors of n collapses
+    to phi(n // f). `primes` are the distinct prime factors of n."""
+    k = n // f
+    size = k
+    for p in primes:
+        if k % p == 0:
+            size -= size // p
+    return size
+
+def factor_set(n, f):
+    """The multiples of f below n that are claimed by f (gcd(m, n) == f), ascending."""
+    k = n // f
+    return [f * j for j in range(1, k) if math.gcd(j, k) == 1]
+
+def is_prime(factorization):
+    return len(factorization) == 1 and factorization[0][1] == 1
+
+def graph_descriptors(n, factorization):
+    """The compact ["C", a] / ["K", a, b] graph entries for n regardless of GRAPH_THRESHOLD,
+    largest a first as in compute_record()."""
+    factors = get_divisors(factorization)[-2:0:-1]
+    return [["C", a] if a * a == n else ["K", a, n // a] for a in factors if a * a >= n]
+
+def compute_record(n, factorization):
+    """Computes the records row (n, components_str, w, graph_data, is_prime) for one n,
+    plus its components table entries as [(kind, low, high, multiplicity), ...]."""
+    # 1. Check Prime
+    if is_prime(factorization):
+        return (n, "", 0, json.dumps(None), 1), []
+    
+    # 2. Factorization & Set Sizes
+    # Proper divisors (excluding 1 and n), largest first
+    factors = get_divisors(factorization)[-2:0:-1]
+    primes = [p for p, _ in factorization]
+
+    # 3. Pair up factorizations
+    components = [] # List of tuples ("K", sizeA, sizeB) or ("C", size)
+    parts = {} # (kind, low, high) -> multiplicity, for the components table
+    w = 0
+    
+    # We need to find pairs (a,b) such that a*b = n.
+    # To avoid duplicates (e.g. 2*27 and 27*2), we only take a >= b. Since factors
+    # is sorted descending, the first a < b means every pair has been seen.
+
+    # Compact graph: one ["C", a] or ["K", a, b] per component. The vertex sets are
+    # factor_set(n, a) / factor_set(n, b), so server.py rebuilds nodes and edges on request
+    graph = []
+
+    for a in factors:
+        b = n // a
+        if a < b: break
+
+        len_a = set_size(n, a, primes)
+        len_b = set_size(n, b, primes)
+
+        # Graphing Data Generation (if n < GRAPH_THRESHOLD)
+        if n < GRAPH_THRESHOLD:
+            graph.append(["C", a] if a == b else ["K", a, b])
+
+        if a == b:
+            # Perfect Square Case -> C_{m}
+            components.append(f"C_{{{len_a}}}")
+            key = ("C", len_a, len_a)
+            w += len_a
+        else:
+            # Bipartite Case -> K_{x,y}
+            # We store K_{min,max} for consistency in string, 
+            # but math-wise order doesn't matter.
+            low = min(len_a, len_b)
+            high = max(len_a, len_b)
+            components.append(f"K_{{{low},{high}}}")
+            key = ("K", low, high)
+            w += (len_a + len_b)
+        parts[key] = parts.get(key, 0) + 1
+
+    # Format data for DB
+    comp_str = ", ".join(components)
+    g_data = graph if n < GRAPH_THRESHOLD else None
+
+    return (n, comp_str, w, json.dumps(g_data, separators=(",", ":")), 0), [(*key, count) for key, count in parts.items()]
+
+# ---------------------------------------------------------
+# Single n of any size (Miller-Rabin + Pollard's rho)
+# ---------------------------------------------------------
+# compute_record() never enumerates multiples, it only needs the divisors of n and
+# phi(n / d) for each of them. So a row for one n far past the generated range is as
+# cheap as its factorization, which needs no sieve up to sqrt(n).
+
+# Deterministic Miller-Rabin bases for every n < 3.3 * 10^24
+MILLER_RABIN_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+RHO_BATCH = 128  # Pollard's rho steps per gcd
+
+def miller_rabin(n):
+    """Whether n is prime. Deterministic below 3.3 * 10^24, a strong probable prime test past that."""
+    if n < 2:
+        return False
+    for p in MILLER_RABIN_BASES:
+        if n % p == 0:
+            return n == p
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for a in MILLER_RABIN_BASES:
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
     return True
 
-def generate_data():
-    conn = sqlite3.connect(DB_NAME)
+def pollard_rho(n):
+    """A nontrivial factor of the odd composite n, by Brent's variant of Pollard's rho."""
+    for c in range(1, n):
+        y, r, q, g = 2, 1, 1, 1
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(RHO_BATCH, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                g = math.gcd(q, n)
+                k += RHO_BATCH
+            r *= 2
+        if g == n:
+            # The batch overshot: step back through it one gcd at a time
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % n
+                g = math.gcd(abs(x - ys), n)
+        if g != n:
+            return g
+        # This c cycled without splitting n, try the next polynomial
+
+TRIAL_PRIMES = small_primes(TRIAL_DIVISION_LIMIT)
+
+@functools.lru_cache(maxsize=COMPUTE_CACHE_SIZE)
+def factorize(n):
+    """Prime factorization of a single n >= 1 as [(p, e), ...], ascending, like factor_block()."""
+    exponents = {}
+    for p in TRIAL_PRIMES:
+        if p * p > n:
+            break
+        while n % p == 0:
+            n //= p
+            exponents[p] = exponents.get(p, 0) + 1
+    pending = [n] if n > 1 else []
+    while pending:
+        m = pending.pop()
+        if miller_rabin(m):
+            exponents[m] = exponents.get(m, 0) + 1
+        else:
+            d = pollard_rho(m)
+            pending.extend((d, m // d))
+    return sorted(exponents.items())
+
+@functools.lru_cache(maxsize=COMPUTE_CACHE_SIZE)
+def compute_n(n):
+    """compute_record() for a single n of any size (n >= 2), from factorize() instead of a sieve."""
+    return compute_record(n, factorize(n))
+
+# ---------------------------------------------------------
+# Vectorized engine (NumPy) for n >= GRAPH_THRESHOLD
+# ---------------------------------------------------------
+# Without graph descriptors a row only needs phi of the divisors of n:
+#   w = sum of phi(d) over 1 < d < n = n - 1 - phi(n), and
+#   each pair b * a = n with 2 <= b <= a is one component with set sizes phi(b), phi(a).
+# phi(n) comes from a segmented sieve over the range, phi(b) from a small table up to
+# sqrt(n), and phi(a) = phi(n) / phi(b) / g * phi(g) with g = gcd(a, b), evaluated in that
+# order so every step is an exact integer division and nothing exceeds phi(n).
+
+def phi_range(lo, hi):
+    """Euler's phi of every n in [lo, hi) (lo >= 1) as an int64 array, by segmented sieve."""
+    phi = np.arange(lo, hi, dtype=np.int64)
+    residual = phi.copy()
+    for p in small_primes(math.isqrt(hi - 1)):
+        start = -lo % p
+        phi[start::p] -= phi[start::p] // p
+        pk = p
+        while pk < hi:
+            residual[-lo % pk::pk] //= p
+            pk *= p
+    # What's left is a single prime factor above sqrt(hi)
+    big = residual > 1
+    phi[big] -= phi[big] // residual[big]
+    return phi
+
+def vector_block(lo, hi):
+    """Columns for every n in [lo, hi): (is_prime, w, starts, is_c, low, high).
+    Components of n - lo are entries starts[i]:starts[i + 1] of is_c / low / high, in the
+    order compute_record() lists them (smallest b first)."""
+    n = np.arange(lo, hi, dtype=np.int64)
+    phi = phi_range(lo, hi)
+    root = math.isqrt(hi - 1)
+    small_phi = np.concatenate(([0], phi_range(1, root + 1)))  # small_phi[d] = phi(d)
+
+    # Every (b, a) with b <= a and b * a in [lo, hi): a runs over max(ceil(lo / b), b) .. ceil(hi / b) - 1
+    b = np.arange(2, root + 1, dtype=np.int64)
+    first_a = np.maximum(-(-lo // b), b)
+    counts = np.maximum(-(-hi // b) - first_a, 0)
+    total = int(counts.sum())
+    skip = np.repeat(np.cumsum(counts) - counts, counts)
+    b = np.repeat(b, counts)
+    a = np.repeat(first_a, counts) + (np.arange(total, dtype=np.int64) - skip)
+    pair_n = a * b
+    order = np.lexsort((b, pair_n))
+    a, b, pair_n = a[order], b[order], pair_n[order]
+
+    phi_b = small_phi[b]
+    g = np.gcd(a, b)
+    phi_a = phi[pair_n - lo] // phi_b // g * small_phi[g]
+
+    is_prime = phi == n - 1
+    w = n - 1 - phi  # 0 for primes
+    starts = np.searchsorted(pair_n, np.arange(lo, hi + 1, dtype=np.int64))
+    return is_prime, w, starts, a == b, np.minimum(phi_a, phi_b), np.maximum(phi_a, phi_b)
+
+def vector_records(lo, hi):
+    """compute_record() for every n in [lo, hi) from vector_block(); lo >= GRAPH_THRESHOLD."""
+    is_prime, w, starts, is_c, low, high = (col.tolist() for col in vector_block(lo, hi))
+    labels = [f"C_{{{x}}}" if c else f"K_{{{x},{y}}}" for c, x, y in zip(is_c, low, high)]
+    singles = [("C", x, y, 1) if c else ("K", x, y, 1) for c, x, y in zip(is_c, low, high)]
+    records = []
+    for i in range(hi - lo):
+        n = lo + i
+        if is_prime[i]:
+            records.append(((n, "", 0, "null", 1), []))
+            continue
+        first, last = starts[i], starts[i + 1]
+        counts = Counter(singles[first:last])
+        if len(counts) == last - first:  # No repeated component, the usual case
+            parts = singles[first:last]
+        else:
+            parts = [(kind, x, y, count) for (kind, x, y, _), count in counts.items()]
+        records.append(((n, ", ".join(labels[first:last]), w[i], "null", 0), parts))
+    return records
+
+def vectorized(lo, hi):
+    """Whether [lo, hi) goes through the NumPy engine."""
+    return np is not None and lo >= GRAPH_THRESHOLD and math.isqrt(hi - 1) <= VECTOR_MAX_ROOT
+
+def chunk_end(lo, end_n=None):
+    """End of the chunk of n computed together starting at lo. Chunks never straddle
+    GRAPH_THRESHOLD, so each one is either all NumPy engine or all per-n."""
+    hi = lo + (VECTOR_BLOCK if vectorized(lo, lo + VECTOR_BLOCK) else SIEVE_BLOCK)
+    if np is not None and lo < GRAPH_THRESHOLD:
+        hi = min(hi, GRAPH_THRESHOLD)
+    return hi if end_n is None else min(hi, end_n)
+
+def compute_chunk(lo, hi):
+    """Worker entry point: (row, parts) for every n in [lo, hi), already JSON-encoded for the writer."""
+    if vectorized(lo, hi):
+        return vector_records(lo, hi)
+    return [compute_record(lo + i, f) for i, f in enumerate(factor_block(lo, hi))]
+
+def init_worker():
+    # Ctrl+C reaches the whole process group; only the writer decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def record_stream(start_n, end_n=None, stages=None):
+    """Yields (row, parts) in n order, computed in this process, one chunk at a time.
+    Stops before end_n if given, otherwise runs forever. Seconds spent sieving and computing
+    are added to stages["factor"] / stages["compute"] if given (the NumPy engine counts as compute)."""
+    if stages is None:
+        stages = {"factor": 0.0, "compute": 0.0}
+    lo = start_n
+    while end_n is None or lo < end_n:
+        hi = chunk_end(lo, end_n)
+        start = time.perf_counter()
+        if vectorized(lo, hi):
+            records = vector_records(lo, hi)
+            stages["compute"] += time.perf_counter() - start
+            yield from records
+        else:
+            factorizations = factor_block(lo, hi)
+            stages["factor"] += time.perf_counter() - start
+            for i, factorization in enumerate(factorizations):
+                start = time.perf_counter()
+                record = compute_record(lo + i, factorization)
+                stages["compute"] += time.perf_counter() - start
+                yield record
+        lo = hi
+
+def parallel_record_stream(pool, start_n, workers, end_n=None):
+    """Yields (row, parts) in n order while the pool works on the contiguous chunks ahead.
+    At most two chunks per worker are in flight so memory stays bounded."""
+    pending = deque()
+    next_lo = start_n
+    while True:
+        while len(pending) < workers * 2 and (end_n is None or next_lo < end_n):
+            hi = chunk_end(next_lo, end_n)
+            pending.append(pool.apply_async(compute_chunk, (next_lo, hi)))
+            next_lo = hi
+        if not pending:
+            return
+        yield from pending.popleft().get()
+
+def begin_ingest(conn):
+    """Bulk-load settings: no durable journal, no fsync, big page cache.
+    page_size only takes effect if the database file is still empty."""
+    conn.execute("PRAGMA page_size = 65536")
+    conn.execute("PRAGMA journal_mode = MEMORY")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144")  # 256 MiB
+    conn.execute("PRAGMA temp_store = MEMORY")
+    # Maintaining indexes row by row is slower than building them once at the end
+    for name in INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+def end_ingest(conn):
+    """Builds the deferred indexes and puts the database back on durable settings."""
+    print("Building indexes...")
+    create_indexes(conn)
+    conn.commit()
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.execute("PRAGMA synchronous = FULL")
+
+def create_indexes(conn):
+    for name, definition in INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+
+def parse_components(comp_str):
+    """Turns a components_str back into [(kind, low, high, multiplicity), ...]."""
+    parts = {}
+    for kind, low, high in COMPONENT_RE.findall(comp_str):
+        key = (kind, int(low), int(high or low))
+        parts[key] = parts.get(key, 0) + 1
+    return [(*key, count) for key, count in parts.items()]
+
+def init_db(conn, ingest=False):
+    """Creates the tables (and their indexes, unless bulk loading) if missing."""
     c = conn.cursor()
-    
-    # Create table
     c.execute('''CREATE TABLE IF NOT EXISTS records (
                     n INTEGER PRIMARY KEY,
                     components_str TEXT,
@@ -48,140 +443,645 @@ def generate_data():
                     graph_data JSON,
                     is_prime INTEGER
                 )''')
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'components'")
+    had_components = c.fetchone() is not None
+    # One row per distinct component of n; C_{m} is stored as low = high = m
+    c.execute('''CREATE TABLE IF NOT EXISTS components (
+                    n INTEGER,
+                    kind TEXT,
+                    low INTEGER,
+                    high INTEGER,
+                    multiplicity INTEGER,
+                    PRIMARY KEY (n, kind, low, high)
+                ) WITHOUT ROWID''')
+    if not had_components:
+        # Databases from before the components table: rebuild it from components_str
+        c.execute("SELECT n, components_str FROM records WHERE is_prime = 0")
+        rows = [(n, *part) for n, comp_str in c.fetchall() for part in parse_components(comp_str)]
+        if rows:
+            print(f"Backfilling components table for {len(rows)} entries...")
+            c.executemany("INSERT OR IGNORE INTO components VALUES (?, ?, ?, ?, ?)", rows)
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'postings'")
+    had_postings = c.fetchone() is not None
+    c.execute('''CREATE TABLE IF NOT EXISTS postings (
+                    sig TEXT,
+                    block INTEGER,
+                    last_n INTEGER,
+                    count INTEGER,
+                    data BLOB,
+                    PRIMARY KEY (sig, block)
+                ) WITHOUT ROWID''')
+    if not had_postings:
+        backfill_postings(conn)
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rollup_blocks'")
+    had_rollups = c.fetchone() is not None
+    # Per-block aggregates for analytics (per-signature counts are the postings counts)
+    c.execute('''CREATE TABLE IF NOT EXISTS rollup_blocks (
+                    block INTEGER PRIMARY KEY,
+                    rows INTEGER,
+                    primes INTEGER,
+                    w_min INTEGER,
+                    w_max INTEGER,
+                    w_sum INTEGER,
+                    max_n INTEGER
+                )''')
+    # Composites per block by number of decimal digits in w
+    c.execute('''CREATE TABLE IF NOT EXISTS rollup_w (
+                    block INTEGER,
+                    digits INTEGER,
+                    rows INTEGER,
+                    PRIMARY KEY (block, digits)
+                ) WITHOUT ROWID''')
+    if not had_rollups:
+        rebuild_rollups(conn)
+    # Progress of the last generator run, one row rewritten with every commit
+    c.execute('''CREATE TABLE IF NOT EXISTS generator_status (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    state TEXT,
+                    pid INTEGER,
+                    started REAL,
+                    updated REAL,
+                    start_n INTEGER,
+                    target_n INTEGER,
+                    current_n INTEGER,
+                    batch_rows INTEGER,
+                    rows_written INTEGER,
+                    rows_per_sec REAL,
+                    eta_seconds REAL,
+                    max_rss_kb INTEGER,
+                    workers INTEGER,
+                    stages JSON
+                )''')
+    if not ingest:
+        create_indexes(conn)
     conn.commit()
 
-    # Get last n
-    c.execute("SELECT MAX(n) FROM records")
-    row = c.fetchone()
-    start_n = (row[0] + 1) if row[0] is not None else 4
-    
-    print(f"Starting generation from n = {start_n}. Press Ctrl+C to stop.")
+def write_batch(c, batch, postings):
+    """Inserts a batch of (row, parts) from compute_record()."""
+    c.executemany("INSERT INTO records VALUES (?, ?, ?, ?, ?)", [row for row, _ in batch])
+    c.executemany("INSERT INTO components VALUES (?, ?, ?, ?, ?)",
+                  [(row[0], *part) for row, parts in batch for part in parts])
+    postings.add_batch(batch)
+    update_rollups(c, batch)
 
-    curr_n = start_n
-    
-    while running:
-        # Transaction batch
-        for _ in range(100): 
-            if not running: break
-            
-            # 1. Check Prime
-            if is_prime(curr_n):
-                c.execute("INSERT INTO records VALUES (?, ?, ?, ?, ?)", 
-                          (curr_n, "", 0, json.dumps(None), 1))
-                curr_n += 1
-                continue
+# ---------------------------------------------------------
+# Rollups: per-block aggregates over records
+# ---------------------------------------------------------
+# w_min/w_max/w_sum and rollup_w cover composites only (primes have w = 0).
 
-            # 2. Factorization & Set Generation
-            factors = get_factors(curr_n)
-            factor_sets = {} # Map factor -> List of numbers
-            seen_multiples = set()
-            
-            # Largest to smallest factor logic
-            for f in factors:
-                multiples = []
-                # Range: f, 2f, 3f ... < n
-                for m in range(f, curr_n, f):
-                    if m not in seen_multiples:
-                        multiples.append(m)
-                        seen_multiples.add(m)
-                factor_sets[f] = multiples
-
-            # 3. Pair up factorizations
-            components = [] # List of tuples ("K", sizeA, sizeB) or ("C", size)
-            w = 0
-            
-            # We need to find pairs (a,b) such that a*b = n.
-            # To avoid duplicates (e.g. 2*27 and 27*2), we iterate through our sorted factors list
-            # and verify the pair.
-            
-            processed_pairs = set()
-
-            graph_nodes = []
-            graph_edges = []
-            group_id = 0
-
-            for a in factors:
-                b = curr_n // a
-                if b in factors: # Valid pair excluding 1,n
-                    # Enforce ordering to avoid duplicates: a >= b
-                    if a < b: continue
-                    
-                    pair_sig = (a, b)
-                    if pair_sig in processed_pairs: continue
-                    processed_pairs.add(pair_sig)
-
-                    set_a = factor_sets[a]
-                    set_b = factor_sets[b]
-                    len_a = len(set_a)
-                    len_b = len(set_b)
-
-                    # Graphing Data Generation (if n < 500)
-                    if curr_n < 500:
-                        # Add nodes with group IDs
-                        # We tag nodes with a prefix to make them unique per component visualization if needed,
-                        # but typically we want the actual numbers. 
-                        # However, since a number can appear in only ONE set globally (due to skipping),
-                        # we can just treat them as unique IDs.
-                        
-                        # Note: In the K_xy case, set_a and set_b are disjoint because of the skipping rule?
-                        # Actually, wait. The skipping rule is global for 'seen_multiples'.
-                        # If 18 is in set(18), it cannot be in set(9).
-                        # So set_a and set_b are disjoint sets of integers.
-                        
-                        # Add nodes
-                        for val in set_a:
-                            graph_nodes.append({"id": val, "label": str(val), "group": group_id})
-                        for val in set_b:
-                            # If a == b, set_a is set_b, don't re-add
-                            if a != b:
-                                graph_nodes.append({"id": val, "label": str(val), "group": group_id})
-
-                        # Add edges
-                        if a == b:
-                            # Complete graph on set_a
-                            # Connect every node to every other node
-                            for i in range(len(set_a)):
-                                for j in range(i + 1, len(set_a)):
-                                    graph_edges.append({"from": set_a[i], "to": set_a[j]})
-                        else:
-                            # Complete Bipartite between set_a and set_b
-                            for u in set_a:
-                                for v in set_b:
-                                    graph_edges.append({"from": u, "to": v})
-                    
-                    group_id += 1
-
-                    if a == b:
-                        # Perfect Square Case -> C_{m}
-                        components.append(f"C_{{{len_a}}}")
-                        w += len_a
-                    else:
-                        # Bipartite Case -> K_{x,y}
-                        # We store K_{min,max} for consistency in string, 
-                        # but math-wise order doesn't matter.
-                        low = min(len_a, len_b)
-                        high = max(len_a, len_b)
-                        components.append(f"K_{{{low},{high}}}")
-                        w += (len_a + len_b)
-
-            # Format data for DB
-            comp_str = ", ".join(components)
-            g_data = None
-            if curr_n < 500:
-                # Deduplicate nodes just in case (though logic suggests disjointness)
-                unique_nodes = {node['id']: node for node in graph_nodes}.values()
-                g_data = {"nodes": list(unique_nodes), "edges": graph_edges}
-
-            c.execute("INSERT INTO records VALUES (?, ?, ?, ?, ?)", 
-                      (curr_n, comp_str, w, json.dumps(g_data), 0))
-            
-            curr_n += 1
-        
-        conn.commit()
-        print(f"Processed up to n={curr_n-1}")
+def update_rollups(c, batch):
+    """Adds a batch of new rows to the rollups of the blocks they fall in."""
+    blocks = {}
+    digits = {}
+    for row, _ in batch:
+        n, w, prime = row[0], row[2], row[4]
+        block = n // POSTINGS_BLOCK
+        stats = blocks.get(block)
+        if stats is None:
+            stats = blocks[block] = [block, 0, 0, None, None, 0, n]
+        stats[1] += 1
+        stats[6] = max(stats[6], n)
+        if prime:
+            stats[2] += 1
+            continue
+        stats[3] = w if stats[3] is None else min(stats[3], w)
+        stats[4] = w if stats[4] is None else max(stats[4], w)
+        stats[5] += w
+        key = (block, len(str(w)))
+        digits[key] = digits.get(key, 0) + 1
+    c.executemany("""INSERT INTO rollup_blocks VALUES (?, ?, ?, ?, ?, ?, ?)
+                     ON CONFLICT (block) DO UPDATE SET
+                         rows = rows + excluded.rows,
+                         primes = primes + excluded.primes,
+                         w_min = COALESCE(MIN(w_min, excluded.w_min), w_min, excluded.w_min),
+                         w_max = COALESCE(MAX(w_max, excluded.w_max), w_max, excluded.w_max),
+                         w_sum = w_sum + excluded.w_sum,
+                         max_n = MAX(max_n, excluded.max_n)""", blocks.values())
+    c.executemany("""INSERT INTO rollup_w VALUES (?, ?, ?)
+                     ON CONFLICT (block, digits) DO UPDATE SET rows = rows + excluded.rows""",
+                  [(*key, rows) for key, rows in digits.items()])
+
+def rebuild_rollups(conn, lo=None, hi=None):
+    """Recomputes the rollups of every block overlapping [lo, hi] (all blocks by default) from records."""
+    block_lo = 0 if lo is None else lo // POSTINGS_BLOCK
+    block_hi = (1 << 62) // POSTINGS_BLOCK if hi is None else hi // POSTINGS_BLOCK
+    params = (POSTINGS_BLOCK, block_lo * POSTINGS_BLOCK, (block_hi + 1) * POSTINGS_BLOCK)
+    conn.execute("DELETE FROM rollup_blocks WHERE block BETWEEN ? AND ?", (block_lo, block_hi))
+    conn.execute("DELETE FROM rollup_w WHERE block BETWEEN ? AND ?", (block_lo, block_hi))
+    conn.execute("""INSERT INTO rollup_blocks
+                    SELECT n / ?1, COUNT(*), SUM(is_prime),
+                           MIN(CASE WHEN is_prime = 0 THEN w END), MAX(CASE WHEN is_prime = 0 THEN w END),
+                           COALESCE(SUM(CASE WHEN is_prime = 0 THEN w END), 0), MAX(n)
+                    FROM records WHERE n >= ?2 AND n < ?3 GROUP BY n / ?1""", params)
+    conn.execute("""INSERT INTO rollup_w
+                    SELECT n / ?1, LENGTH(w), COUNT(*)
+                    FROM records WHERE n >= ?2 AND n < ?3 AND is_prime = 0 GROUP BY n / ?1, LENGTH(w)""", params)
+
+# ---------------------------------------------------------
+# Inverted index: component signature -> postings list of n
+# ---------------------------------------------------------
+# The postings table holds one segment per (sig, block), covering n in
+# [block * POSTINGS_BLOCK, (block + 1) * POSTINGS_BLOCK). A segment is the sorted
+# n as varint-encoded deltas, starting from the block's first n.
+
+def signature(kind, low, high):
+    return f"C_{{{low}}}" if kind == "C" else f"K_{{{low},{high}}}"
 
+def partial_signature(value):
+    """Postings key for every K_{x,y} with x or y equal to value."""
+    return f"K_{{{value},*}}"
+
+def signatures(parts):
+    """Every postings key an n with these components belongs to."""
+    sigs = set()
+    for kind, low, high, _ in parts:
+        sigs.add(signature(kind, low, high))
+        if kind == "C":
+            sigs.add(ANY_COMPLETE)
+        else:
+            sigs.add(partial_signature(low))
+            sigs.add(partial_signature(high))
+    return sigs
+
+def encode_postings(ns, prev):
+    out = bytearray()
+    for n in ns:
+        delta = n - prev
+        prev = n
+        while delta >= 0x80:
+            out.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        out.append(delta)
+    return bytes(out)
+
+def decode_postings(data, prev):
+    ns = []
+    delta = shift = 0
+    for byte in data:
+        delta |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            prev += delta
+            ns.append(prev)
+            delta = shift = 0
+    return ns
+
+class PostingsWriter:
+    """Appends each committed batch's n to the postings segments of their signatures."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.blocks = {}  # block -> {sig: last n in that segment}, loaded a block at a time
+
+    def block_tips(self, block):
+        if block not in self.blocks:
+            self.blocks[block] = dict(self.conn.execute(
+                "SELECT sig, last_n FROM postings WHERE block = ?", (block,)).fetchall())
+        return self.blocks[block]
+
+    def add_batch(self, batch):
+        if len(self.blocks) > 16:
+            self.blocks.clear()
+        new = {}
+        for row, parts in batch:
+            n = row[0]
+            block = n // POSTINGS_BLOCK
+            for sig in signatures(parts):
+                new.setdefault((sig, block), []).append(n)
+
+        inserts, appends = [], []
+        for (sig, block), ns in new.items():
+            tips = self.block_tips(block)
+            last = tips.get(sig)
+            if last is None:
+                inserts.append((sig, block, ns[-1], len(ns), encode_postings(ns, block * POSTINGS_BLOCK)))
+            elif ns[0] > last:
+                # The usual case: the batch continues where the segment stopped
+                appends.append((ns[-1], len(ns), encode_postings(ns, last), sig, block))
+            else:
+                # Filling a gap behind the tip: re-encode the whole segment
+                merge_segment(self.conn, sig, block, ns)
+            tips[sig] = max(ns[-1], last or 0)
+        self.conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?, ?)", inserts)
+        self.conn.executemany("""UPDATE postings SET last_n = ?, count = count + ?, data = CAST(data || ? AS BLOB)
+                                 WHERE sig = ? AND block = ?""", appends)
+
+def merge_segment(conn, sig, block, ns):
+    """Adds ns (in any order) to the segment for (sig, block), rewriting it."""
+    row = conn.execute("SELECT data FROM postings WHERE sig = ? AND block = ?", (sig, block)).fetchone()
+    base = block * POSTINGS_BLOCK
+    merged = sorted(set(ns).union(decode_postings(row[0], base) if row else []))
+    conn.execute("INSERT OR REPLACE INTO postings VALUES (?, ?, ?, ?, ?)",
+                 (sig, block, merged[-1], len(merged), encode_postings(merged, base)))
+
+def backfill_postings(conn):
+    """Builds the postings table from the components table (databases from before postings)."""
+    postings = PostingsWriter(conn)
+    batch = []
+    current = None
+    for n, kind, low, high, multiplicity in conn.execute("SELECT * FROM components ORDER BY n").fetchall():
+        if n != current:
+            batch.append(((n,), []))
+            current = n
+        batch[-1][1].append((kind, low, high, multiplicity))
+    print(f"Backfilling postings for {len(batch)} n...")
+    for i in range(0, len(batch), INGEST_COMMIT_ROWS):
+        postings.add_batch(batch[i:i + INGEST_COMMIT_ROWS])
+
+def find_gaps(conn, lo, hi):
+    """Returns the [first, last] ranges of n in [lo, hi) that have no row, in order."""
+    c = conn.cursor()
+    c.execute("""SELECT prev + 1, n - 1 FROM (
+                     SELECT n, LAG(n, 1, ?) OVER (ORDER BY n) AS prev
+                     FROM records WHERE n >= ? AND n < ?
+                 ) WHERE n - prev > 1""", (lo - 1, lo, hi))
+    gaps = [tuple(r) for r in c.fetchall()]
+    c.execute("SELECT MAX(n) FROM records WHERE n >= ? AND n < ?", (lo, hi))
+    last = c.fetchone()[0]
+    tail_start = lo if last is None else last + 1
+    if tail_start < hi:
+        gaps.append((tail_start, hi - 1))
+    return gaps
+
+def report_gaps(db_name, lo=None, hi=None):
+    """Prints the missing n in a database. Defaults to [4, MAX(n)]."""
+    conn = sqlite3.connect(db_name)
+    max_n = conn.execute("SELECT MAX(n) FROM records").fetchone()[0] or 3
+    lo = 4 if lo is None else lo
+    hi = max_n + 1 if hi is None else hi
+    gaps = find_gaps(conn, lo, hi)
+    conn.close()
+    missing = sum(last - first + 1 for first, last in gaps)
+    for first, last in gaps:
+        print(f"  missing n = {first}" if first == last else f"  missing n = {first}..{last}")
+    print(f"{db_name}: {missing} missing n in [{lo}, {hi}) across {len(gaps)} gap(s).")
+    return gaps
+
+def merge_shards(shard_paths, db_name=DB_NAME):
+    """Bulk-copies the records of each shard database into db_name.
+    Rows already present in db_name are kept as they are."""
+    conn = sqlite3.connect(db_name)
+    begin_ingest(conn)
+    init_db(conn, ingest=True)
+    for path in shard_paths:
+        conn.execute("ATTACH DATABASE ? AS shard", (path,))
+        lo, hi, count = conn.execute("SELECT MIN(n), MAX(n), COUNT(*) FROM shard.records").fetchone()
+        conn.execute("INSERT OR IGNORE INTO records SELECT n, components_str, w, graph_data, is_prime FROM shard.records")
+        conn.execute("INSERT OR IGNORE INTO components SELECT n, kind, low, high, multiplicity FROM shard.components")
+        # Segments only one side has are copied; blocks split across databases are merged
+        shared = conn.execute("""SELECT s.sig, s.block, s.data FROM shard.postings s
+                                 JOIN postings p ON p.sig = s.sig AND p.block = s.block""").fetchall()
+        for sig, block, data in shared:
+            merge_segment(conn, sig, block, decode_postings(data, block * POSTINGS_BLOCK))
+        conn.execute("INSERT OR IGNORE INTO postings SELECT sig, block, last_n, count, data FROM shard.postings")
+        if count:
+            rebuild_rollups(conn, lo, hi)
+        conn.commit()
+        conn.execute("DETACH DATABASE shard")
+        print(f"Merged {path}: {count} rows covering n = {lo}..{hi}")
+    end_ingest(conn)
     conn.close()
-    print("Database closed.")
+    report_gaps(db_name)
+
+# ---------------------------------------------------------
+# Progress telemetry
+# ---------------------------------------------------------
+
+STATUS_COLUMNS = ("state", "pid", "started", "updated", "start_n", "target_n", "current_n", "batch_rows",
+                  "rows_written", "rows_per_sec", "eta_seconds", "max_rss_kb", "workers", "stages")
+
+def max_rss_kb():
+    """Peak resident memory of this process in KiB, or None where it can't be read."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # macOS reports bytes
+
+class Progress:
+    """Throughput, ETA and per-stage timers of a generator run, for the status table."""
+
+    def __init__(self, start_n, target_n, remaining, workers):
+        self.start_n = start_n
+        self.target_n = target_n
+        self.remaining = remaining  # n still to write, if the run has a target
+        self.workers = workers
+        self.started = time.time()
+        self.rows = 0
+        self.window = deque([(time.monotonic(), 0)])  # (time, rows) at recent commits
+        self.stages = {"factor": 0.0, "compute": 0.0, "write": 0.0} if workers <= 1 else {"workers": 0.0, "write": 0.0}
+
+    def add(self, rows):
+        now = time.monotonic()
+        self.rows += rows
+        self.window.append((now, self.rows))
+        while len(self.window) > 2 and now - self.window[1][0] >= PROGRESS_WINDOW_SECONDS:
+            self.window.popleft()
+
+    def rate(self):
+        (first_t, first_rows), (last_t, last_rows) = self.window[0], self.window[-1]
+        return (last_rows - first_rows) / (last_t - first_t) if last_t > first_t else 0.0
+
+    def status(self, state, current_n, batch_rows):
+        rate = self.rate()
+        eta = None
+        if self.remaining is not None and rate > 0:
+            eta = max(self.remaining - self.rows, 0) / rate
+        return {
+            "state": state,
+            "pid": os.getpid(),
+            "started": self.started,
+            "updated": time.time(),
+            "start_n": self.start_n,
+            "target_n": self.target_n,
+            "current_n": current_n,
+            "batch_rows": batch_rows,
+            "rows_written": self.rows,
+            "rows_per_sec": round(rate, 1),
+            "eta_seconds": None if eta is None else round(eta, 1),
+            "max_rss_kb": max_rss_kb(),
+            "workers": self.workers,
+            "stages": {stage: round(sec, 3) for stage, sec in self.stages.items()},
+        }
+
+def progress_line(status):
+    """Rate and ETA of a status for the "Processed up to" line."""
+    line = f"{status['rows_per_sec']:,.0f} rows/s"
+    if status["eta_seconds"] is not None:
+        minutes, seconds = divmod(int(status["eta_seconds"]), 60)
+        line += f", ETA {minutes // 60}:{minutes % 60:02d}:{seconds:02d}"
+    return line
+
+def write_status(c, status):
+    c.execute(f"INSERT OR REPLACE INTO generator_status (id, {', '.join(STATUS_COLUMNS)}) "
+              f"VALUES (1, {', '.join('?' * len(STATUS_COLUMNS))})",
+              [json.dumps(status[col]) if col == "stages" else status[col] for col in STATUS_COLUMNS])
+
+# ---------------------------------------------------------
+# Output sinks
+# ---------------------------------------------------------
+# generate_data() hands each batch to a sink: SqliteSink is the database the server
+# reads, ColumnarSink writes Parquet or Arrow IPC files for dataframe tools. The run's
+# status goes along with every batch (and once more, without rows, when it ends).
+
+class SqliteSink:
+    def __init__(self, db_name, ingest=False, live=False):
+        self.name = db_name
+        self.ingest = ingest
+        self.conn = sqlite3.connect(db_name)
+        if live:
+            # Readers (the server) keep their snapshot while a commit lands, and commits
+            # never wait for readers. The mode sticks to the database file.
+            self.conn.execute("PRAGMA journal_mode = WAL")
+            self.conn.execute("PRAGMA synchronous = NORMAL")
+        if ingest:
+            begin_ingest(self.conn)
+        init_db(self.conn, ingest)
+        self.postings = PostingsWriter(self.conn)
+
+    def last_n(self):
+        return self.conn.execute("SELECT MAX(n) FROM records").fetchone()[0]
+
+    def gaps(self, lo, hi):
+        return find_gaps(self.conn, lo, hi)
+
+    def write(self, batch, status):
+        c = self.conn.cursor()
+        if batch:
+            write_batch(c, batch, self.postings)
+        write_status(c, status)
+        self.conn.commit()
+
+    def close(self):
+        if self.ingest:
+            end_ingest(self.conn)
+        self.conn.close()
+        print("Database closed.")
+
+def load_pyarrow():
+    """pyarrow is only needed for the columnar formats, so it's imported on demand."""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        sys.exit("--format parquet/arrow needs pyarrow (pip install pyarrow).")
+    return pyarrow
+
+class ColumnarSink:
+    """Writes part_FIRST_LAST.parquet (or .arrow) files into a directory, each holding a
+    contiguous run of n. Rows are buffered until COLUMNAR_FILE_ROWS or a break in n, so
+    anything still buffered when the process dies is recomputed on the next run."""
+
+    PART_RE = re.compile(r"part_(\d+)_(\d+)\.(parquet|arrow)")
+
+    def __init__(self, out_dir, fmt):
+        self.pa = load_pyarrow()
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.buffer = []
+        self.status_written = 0.0
+        os.makedirs(out_dir, exist_ok=True)
+        pa = self.pa
+        self.schema = pa.schema([
+            ("n", pa.int64()),
+            ("w", pa.int64()),
+            ("is_prime", pa.bool_()),
+            ("components", pa.list_(pa.struct([
+                ("kind", pa.string()),
+                ("low", pa.int64()),
+                ("high", pa.int64()),
+                ("multiplicity", pa.int32()),
+            ]))),
+            ("graph_data", pa.binary()),  # The graph_data JSON, null where it isn't stored
+        ])
+
+    def parts(self):
+        """(first, last) n of every file already written, in order."""
+        found = []
+        for name in os.listdir(self.out_dir):
+            match = self.PART_RE.fullmatch(name)
+            if match and match.group(3) == self.fmt:
+                found.append((int(match.group(1)), int(match.group(2))))
+        return sorted(found)
+
+    def last_n(self):
+        parts = self.parts()
+        return max(last for _, last in parts) if parts else None
+
+    def gaps(self, lo, hi):
+        gaps = []
+        next_n = lo
+        for first, last in self.parts():
+            if last < next_n:
+                continue
+            if first >= hi:
+                break
+            if first > next_n:
+                gaps.append((next_n, first - 1))
+            next_n = last + 1
+        if next_n < hi:
+            gaps.append((next_n, hi - 1))
+        return gaps
+
+    def write(self, batch, status):
+        for row in batch:
+            if self.buffer and row[0][0] != self.buffer[-1][0][0] + 1:
+                self.flush()
+            self.buffer.append(row)
+            if len(self.buffer) >= COLUMNAR_FILE_ROWS:
+                self.flush()
+        if status["state"] != "running" or time.monotonic() - self.status_written >= STATUS_FILE_SECONDS:
+            self.write_status(status)
+
+    def write_status(self, status):
+        path = os.path.join(self.out_dir, STATUS_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(status, f, indent=1)
+        os.replace(path + ".tmp", path)
+        self.status_written = time.monotonic()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        pa = self.pa
+        rows = [row for row, _ in self.buffer]
+        table = pa.table({
+            "n": [r[0] for r in rows],
+            "w": [r[2] for r in rows],
+            "is_prime": [bool(r[4]) for r in rows],
+            "components": [[{"kind": kind, "low": low, "high": high, "multiplicity": mult}
+                            for kind, low, high, mult in parts] for _, parts in self.buffer],
+            "graph_data": [None if r[3] in (None, "null") else r[3].encode() for r in rows],
+        }, schema=self.schema)
+        path = os.path.join(self.out_dir, f"part_{rows[0][0]:012d}_{rows[-1][0]:012d}.{self.fmt}")
+        tmp_path = path + ".tmp"
+        if self.fmt == "parquet":
+            pa.parquet.write_table(table, tmp_path, compression="zstd")
+        else:
+            # Uncompressed, so readers can memory-map it without copying
+            with pa.ipc.new_file(tmp_path, self.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        print(f"Files written to {self.out_dir}.")
+
+def generate_data(workers=1, ingest=False, db_name=DB_NAME, start_n=4, end_n=None, fmt="sqlite", target_n=None,
+                  live=False):
+    """target_n only sets the ETA of an open-ended run; with end_n the target is end_n.
+    live puts the database in WAL mode so server.py can read it while rows are written."""
+    sink = SqliteSink(db_name, ingest, live) if fmt == "sqlite" else ColumnarSink(db_name, fmt)
+
+    if end_n is None:
+        # Open-ended run: continue at the latest entry
+        last_n = sink.last_n()
+        if last_n is not None:
+            start_n = max(start_n, last_n + 1)
+        ranges = [(start_n, None)]
+        missing = None if target_n is None else max(target_n - start_n, 0)
+        print(f"Starting generation from n = {start_n}. Press Ctrl+C to stop.")
+    else:
+        # Fixed range (a shard): fill every hole in [start_n, end_n), not just the tip
+        ranges = [(first, last + 1) for first, last in sink.gaps(start_n, end_n)]
+        missing = sum(hi - lo for lo, hi in ranges)
+        target_n = end_n
+        print(f"Filling {missing} missing n in [{start_n}, {end_n}) into {db_name}. Press Ctrl+C to stop.")
+    progress = Progress(start_n, target_n, missing, workers)
+
+    curr_n = ranges[0][0] - 1 if ranges else end_n - 1
+    pool = None
+    if workers > 1:
+        print(f"Computing with {workers} worker processes.")
+        pool = multiprocessing.Pool(workers, initializer=init_worker)
+        rows = chain.from_iterable(parallel_record_stream(pool, lo, workers, hi) for lo, hi in ranges)
+    else:
+        rows = chain.from_iterable(record_stream(lo, hi, progress.stages) for lo, hi in ranges)
+    
+    if ingest:
+        batch_rows, commit_seconds = INGEST_COMMIT_ROWS, INGEST_COMMIT_SECONDS
+    else:
+        batch_rows, commit_seconds = BATCH_SIZE, float("inf")
+
+    finished = False
+    while running and not finished:
+        # Transaction batch: BATCH_SIZE rows, or when ingesting whichever of
+        # INGEST_COMMIT_ROWS / INGEST_COMMIT_SECONDS is reached first
+        batch = []
+        batch_start = time.monotonic()
+        while running and len(batch) < batch_rows:
+            wait_start = time.perf_counter()
+            row = next(rows, None)
+            if pool is not None:
+                progress.stages["workers"] += time.perf_counter() - wait_start
+            if row is None:
+                finished = True
+                break
+            batch.append(row)
+            if time.monotonic() - batch_start >= commit_seconds: break
+
+        if batch:
+            curr_n = batch[-1][0][0]
+            progress.add(len(batch))
+        status = progress.status("running", curr_n, len(batch))
+        if batch:
+            write_start = time.perf_counter()
+            sink.write(batch, status)
+            progress.stages["write"] += time.perf_counter() - write_start
+        print(f"Processed up to n={curr_n} ({progress_line(status)})")
+
+    if pool is not None:
+        # Anything computed past the last commit is simply recomputed on resume
+        pool.terminate()
+        pool.join()
+
+    sink.write([], progress.status("finished" if finished else "stopped", curr_n, 0))
+    sink.close()
 
 if __name__ == "__main__":
-    generate_data()
+    signal.signal(signal.SIGINT, signal_handler)
+
+    parser = argparse.ArgumentParser(description="Populate graph_data.db with Z_n zero-divisor graph data.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes computing rows in parallel (default: 1, no pool)")
+    parser.add_argument("--ingest", action="store_true",
+                        help="bulk-load mode: large commits, relaxed journal/sync, index built at the end")
+    parser.add_argument("--start", type=int, default=4,
+                        help="first n to generate (default: 4)")
+    parser.add_argument("--end", type=int,
+                        help="stop before this n and write to a shard database (graph_data_START_END.db)")
+    parser.add_argument("--db", help=f"database file to use (default: {DB_NAME}, or the shard name with --end)")
+    parser.add_argument("--gaps", action="store_true",
+                        help="report missing n in the database (within --start/--end if given) and exit")
+    parser.add_argument("--merge", nargs="+", metavar="SHARD",
+                        help=f"copy the records of these shard databases into {DB_NAME} (or --db) and exit")
+    parser.add_argument("--format", choices=["sqlite", "parquet", "arrow"], default="sqlite",
+                        help="output: the SQLite database (default), or a directory of Parquet / Arrow IPC "
+                             "files named by n range (--db names the directory; needs pyarrow)")
+    parser.add_argument("--target", type=int,
+                        help="n an open-ended run is heading for; only used for the ETA in the status")
+    parser.add_argument("--live", action="store_true",
+                        help="write in WAL mode so a running server.py reads new rows without blocking either side")
+    args = parser.parse_args()
+    if args.live and (args.ingest or args.format != "sqlite"):
+        parser.error("--live writes the SQLite database the server reads; it can't be combined with --ingest or --format")
+
+    db_name = args.db
+    if db_name is None:
+        if args.format != "sqlite":
+            db_name = f"graph_data_{args.format}"
+        elif args.end is not None and not args.merge:
+            db_name = f"graph_data_{args.start}_{args.end}.db"
+        else:
+            db_name = DB_NAME
+
+    if args.gaps:
+        report_gaps(db_name, args.start, args.end)
+    elif args.merge:
+        merge_shards(args.merge, db_name)
+    else:
+        generate_data(workers=args.workers, ingest=args.ingest, db_name=db_name,
+                      start_n=args.start, end_n=args.end, fmt=args.format, target_n=args.target,
+                      live=args.live)
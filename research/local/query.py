@@ -0,0 +1,826 @@
+import re
+import json
+
+from generator import signature, partial_signature, decode_postings, ANY_COMPLETE, POSTINGS_BLOCK
+
+PROBE_MAX = 2000  # Candidate sets up to this size are checked with n lookups instead of a block range scan
+EXPAND_MAX = 64  # Size ranges covering up to this many signatures are read from their postings lists
+NUM_MAX = 1 << 62  # Largest number in a query (server.py's MAX_N); with the +-1 of < and > it still fits SQLite's 64 bits
+
+# components_str holds one "_" per component, so this is the component count of a row
+COUNT_SQL = "(LENGTH(components_str) - LENGTH(REPLACE(components_str, '_', '')))"
+FIELDS = {"n": "n", "w": "w", "count": COUNT_SQL, "components": COUNT_SQL}
+
+class QueryError(ValueError):
+    """A search query that doesn't parse. The message says what was expected where."""
+
+# ---------------------------------------------------------
+# Grammar
+# ---------------------------------------------------------
+# query    := and { ( "OR" | "|" ) and }
+# and      := not { [ "," | "AND" | "&" ] not }      (terms next to each other are ANDed too)
+# not      := ( "NOT" | "-" | "!" ) not | term
+# term     := [ INT ( "x" | "*" | "×" ) ] component       at least INT of the component
+#           | field OP INT | field ( "=" | ":" ) size    field is n, w or count
+#           | "prime" | "complete" | "(" query ")"
+# component:= size                  C_{size}, as in "6" or "4..10"
+#           | "(" side "," side ")"  K with one side in each (either order); the ")" may be left off
+#           | "C_{" size "}" | "K_{" side "," side "}"
+# side     := size | "*" | nothing   nothing or * matches any size, so "(6," is any K with a 6
+# size     := INT | INT ".." [ INT ] | ".." INT
+#
+# The box's old syntax ("6, (3,4), (2,") parses to the same AND of components as before.
+
+TOKEN_RE = re.compile(r"\s*(?:(\d+)|(\.\.)|(<=|>=|!=|<|>|=|:)|([CK])_\{|([A-Za-z]+)|(\S))")
+
+def tokenize(text):
+    """[(kind, value, position)] with kind one of num, range, op, sig, word, punct."""
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = TOKEN_RE.match(text, pos)
+        num, dots, op, sig, word, punct = m.groups()
+        start = m.start(m.lastindex)
+        if num is not None:
+            # Digits are counted first: int() refuses very long strings with its own error
+            digits = num.lstrip("0") or "0"
+            if len(digits) > len(str(NUM_MAX)) or int(digits) > NUM_MAX:
+                raise QueryError(f"The number at position {start + 1} is too large (at most {NUM_MAX}).")
+            tokens.append(("num", int(digits), start))
+        elif dots is not None:
+            tokens.append(("range", dots, start))
+        elif op is not None:
+            tokens.append(("op", op, start))
+        elif sig is not None:
+            tokens.append(("sig", sig, start))
+        elif word is not None:
+            tokens.append(("word", word.lower(), start))
+        else:
+            tokens.append(("punct", punct, start))
+        pos = m.end()
+    return tokens
+
+class Parser:
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.i = 0
+
+    def peek(self, offset=0):
+        i = self.i + offset
+        return self.tokens[i] if i < len(self.tokens) else ("end", None, None)
+
+    def at(self, kind, *values, offset=0):
+        tok = self.peek(offset)
+        return tok[0] == kind and (not values or tok[1] in values)
+
+    def take(self):
+        tok = self.peek()
+        self.i += 1
+        return tok
+
+    def error(self, expected):
+        kind, value, pos = self.peek()
+        found = "the end of the query" if kind == "end" else f"'{value}' at position {pos + 1}"
+        raise QueryError(f"Expected {expected}, found {found}.")
+
+    def expect(self, kind, value, expected):
+        if not self.at(kind, value):
+            self.error(expected)
+        self.take()
+
+    def parse(self):
+        if not self.tokens:
+            return None
+        node = self.parse_or()
+        if self.peek()[0] != "end":
+            self.error("AND, OR or the end of the query")
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.at("word", "or") or self.at("punct", "|"):
+            self.take()
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else Or(nodes)
+
+    def starts_term(self):
+        kind, value, _ = self.peek()
+        if kind in ("num", "range", "sig"):
+            return True
+        if kind == "word":
+            return value in ("not", "prime", "complete") or value in FIELDS
+        return kind == "punct" and value in "(-!"
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while True:
+            if self.at("punct", ",", "&") or self.at("word", "and"):
+                self.take()
+                if not self.starts_term():
+                    break  # A trailing separator, as in "(6,), "
+            elif not self.starts_term():
+                break
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else And(nodes)
+
+    def parse_not(self):
+        if self.at("word", "not") or self.at("punct", "-", "!"):
+            self.take()
+            return Not(self.parse_not())
+        return self.parse_term()
+
+    def parse_term(self):
+        kind, value, _ = self.peek()
+        if kind == "num" and (self.at("word", "x", offset=1) or self.at("punct", "*", "×", offset=1)):
+            self.take()
+            self.take()
+            if value < 1:
+                raise QueryError("A multiplicity must be at least 1.")
+            comp = self.parse_component()
+            comp.at_least = value
+            return comp
+        if kind == "word":
+            if value in FIELDS:
+                return self.parse_field()
+            if value in ("prime", "complete"):
+                self.take()
+                return Field("prime", 1, 1) if value == "prime" else Comp("C", None)
+        if self.at("punct", "(") and not self.k_term_ahead():
+            self.take()
+            node = self.parse_or()
+            self.expect("punct", ")", "')'")
+            return node
+        return self.parse_component()
+
+    def parse_component(self):
+        kind, value, _ = self.peek()
+        if kind in ("num", "range"):
+            return Comp("C", self.parse_size())
+        if kind == "sig":
+            self.take()
+            if value == "C":
+                comp = Comp("C", self.parse_side())
+            else:
+                first = self.parse_side()
+                self.expect("punct", ",", "','")
+                comp = Comp("K", first, self.parse_side())
+            self.expect("punct", "}", "'}'")
+            return comp
+        if self.at("punct", ","):
+            # ",6)", the old partial search from the other side
+            self.take()
+            second = self.parse_side()
+            self.expect("punct", ")", "')'")
+            return Comp("K", None, second)
+        if self.at("punct", "("):
+            self.take()
+            first = self.parse_side()
+            self.expect("punct", ",", "','")
+            second = self.parse_side()
+            # The closing parenthesis is optional, as in the old "(6," partial search
+            if self.at("punct", ")"):
+                self.take()
+            return Comp("K", first, second)
+        self.error("a component, a field or '('")
+
+    def k_term_ahead(self):
+        """Whether the "(" at the cursor opens a K term rather than a group: it does when
+        a side (possibly empty) and a comma follow."""
+        offset = 1
+        if self.at("punct", "*", offset=offset):
+            offset += 1
+        else:
+            if self.at("num", offset=offset):
+                offset += 1
+            if self.at("range", offset=offset):
+                offset += 1
+                if self.at("num", offset=offset):
+                    offset += 1
+        return self.at("punct", ",", offset=offset)
+
+    def parse_side(self):
+        if self.at("punct", "*"):
+            self.take()
+            return None
+        if self.at("num") or self.at("range"):
+            return self.parse_size()
+        return None
+
+    def parse_size(self):
+        """An inclusive (low, high) range; None stands for an open end."""
+        if self.at("range"):
+            self.take()
+            if not self.at("num"):
+                self.error("a number after '..'")
+            return (None, self.take()[1])
+        if not self.at("num"):
+            self.error("a number")
+        low = self.take()[1]
+        if not self.at("range"):
+            return (low, low)
+        self.take()
+        high = self.take()[1] if self.at("num") else None
+        if high is not None and high < low:
+            raise QueryError(f"The range {low}..{high} is empty.")
+        return (low, high)
+
+    def parse_field(self):
+        name = self.take()[1]
+        if not self.at("op"):
+            self.error(f"a comparison after '{name}'")
+        op = self.take()[1]
+        if op in ("=", ":"):
+            low, high = self.parse_size()
+            return Field(name, low, high)
+        if not self.at("num"):
+            self.error(f"a number after '{name} {op}'")
+        value = self.take()[1]
+        if op == "!=":
+            return Not(Field(name, value, value))
+        return Field(name, *{"<": (None, value - 1), "<=": (None, value),
+                             ">": (value + 1, None), ">=": (value, None)}[op])
+
+# ---------------------------------------------------------
+# Query tree
+# ---------------------------------------------------------
+# Every node answers evaluate(scan, candidates): the n in the scan's current window that
+# match it, restricted to candidates (a set) unless candidates is None.
+
+def size_text(size):
+    if size is None:
+        return "*"
+    low, high = size
+    if low == high:
+        return str(low)
+    return f"{'' if low is None else low}..{'' if high is None else high}"
+
+def between(column, low, high, params):
+    """SQL for low <= column <= high with either end open, appending its parameters."""
+    clauses = []
+    if low is not None:
+        clauses.append(f"{column} >= ?")
+        params.append(low)
+    if high is not None:
+        clauses.append(f"{column} <= ?")
+        params.append(high)
+    return " AND ".join(clauses) or "1=1"
+
+class Comp:
+    """At least at_least components of a kind whose sizes fall in first / second
+    (either way round for K). None matches any size."""
+
+    rank = 0
+
+    def __init__(self, kind, first, second=None, at_least=1):
+        self.kind = kind
+        self.first = first
+        self.second = second
+        self.at_least = at_least
+        self.estimate = 0
+        if kind == "K" and first and second and first[0] == first[1] and second[0] == second[1]:
+            self.first, self.second = sorted((first, second))
+
+    def describe(self):
+        prefix = f"{self.at_least}x" if self.at_least > 1 else ""
+        if self.kind == "C":
+            return prefix + ("complete" if self.first is None else f"C_{{{size_text(self.first)}}}")
+        return prefix + f"K_{{{size_text(self.first)},{size_text(self.second)}}}"
+
+    def postings_keys(self):
+        """Postings lists whose union is every n with at least one matching component, or
+        None if the sizes are open-ended or span more than EXPAND_MAX signatures."""
+        def values(size):
+            low, high = size
+            if low is None:
+                low = 1
+            if high is None or high - low >= EXPAND_MAX:
+                return None
+            return range(low, high + 1)
+
+        if self.kind == "C":
+            if self.first is None:
+                return [ANY_COMPLETE]
+            sizes = values(self.first)
+            return None if sizes is None else [signature("C", m, m) for m in sizes]
+        if self.first is None and self.second is None:
+            return None
+        if self.first is None or self.second is None:
+            sizes = values(self.first or self.second)
+            return None if sizes is None else [partial_signature(v) for v in sizes]
+        firsts, seconds = values(self.first), values(self.second)
+        if firsts is None or seconds is None or len(firsts) * len(seconds) > EXPAND_MAX:
+            return None
+        return list(dict.fromkeys(signature("K", min(a, b), max(a, b)) for a in firsts for b in seconds))
+
+    def postings_key(self):
+        """The postings list that holds exactly the n this matches, if there is one."""
+        keys = self.postings_keys()
+        return keys[0] if keys and len(keys) == 1 and self.at_least == 1 else None
+
+    def condition(self, params):
+        """WHERE clause on the components table. The unary + keeps SQLite from using the size
+        indexes, so the n range or the n lookups pick the rows (primary key seeks)."""
+        sql = "+kind = ?"
+        params.append(self.kind)
+        if self.kind == "C":
+            if self.first is not None:
+                sql += " AND " + between("+low", *self.first, params)
+        elif self.first is not None or self.second is not None:
+            first, second = self.first or (None, None), self.second or (None, None)
+            if self.first is None or self.second is None:
+                side = self.first or self.second
+                sql += f" AND (({between('+low', *side, params)}) OR ({between('+high', *side, params)}))"
+            else:
+                sql += (f" AND (({between('+low', *first, params)} AND {between('+high', *second, params)})"
+                        f" OR ({between('+low', *second, params)} AND {between('+high', *first, params)}))")
+        return sql
+
+    def prepare(self, scan):
+        keys = self.postings_keys()
+        if keys is None:
+            self.rank = 2
+            self.estimate = scan.rows
+        else:
+            # A multiplicity is still checked on the components rows, but only for the postings' n
+            self.rank = 0
+            self.estimate = sum(scan.postings_count(key) for key in keys)
+
+    def blocks(self, scan):
+        keys = self.postings_keys()
+        if keys is None:
+            return None
+        return set().union(*(scan.postings_blocks(key) for key in keys))
+
+    def evaluate(self, scan, candidates):
+        keys = self.postings_keys()
+        if keys is not None:
+            found = scan.segment(keys[0]) if len(keys) == 1 else set().union(*(scan.segment(key) for key in keys))
+            candidates = found if candidates is None else candidates & found
+            if self.at_least == 1 or not candidates:
+                return candidates
+        params = []
+        where = self.condition(params)
+        group = " GROUP BY n HAVING SUM(multiplicity) >= ?" if self.at_least > 1 else " GROUP BY n"
+        if self.at_least > 1:
+            params.append(self.at_least)
+        return scan.select("components", where, params, group, candidates)
+
+class Field:
+    """low <= field <= high on the records row (n, w, count = number of components, or
+    prime = is_prime). None is an open end."""
+
+    rank = 1
+
+    def __init__(self, name, low, high):
+        self.name = name
+        self.low = low
+        self.high = high
+        self.estimate = 0
+
+    def describe(self):
+        if self.name == "prime":
+            return "prime" if self.low else "NOT prime"
+        if self.low == self.high:
+            return f"{self.name} = {self.low}"
+        if self.low is None:
+            return f"{self.name} <= {self.high}"
+        if self.high is None:
+            return f"{self.name} >= {self.low}"
+        return f"{self.name} = {self.low}..{self.high}"
+
+    def condition(self, params):
+        if self.name == "prime":
+            params.append(self.low)
+            return "is_prime = ?"
+        return between(FIELDS[self.name], self.low, self.high, params)
+
+    def blocks(self, scan):
+        if self.name == "n":
+            return scan.block_span(self.low, self.high)
+        if self.name == "w":
+            return scan.w_blocks(self.low, self.high)
+        return None
+
+class And:
+    rank = 0
+
+    def __init__(self, children):
+        self.children = children
+        self.estimate = 0
+
+    def describe(self):
+        return " AND ".join(wrap(c, Or) for c in self.children)
+
+    def condition(self, params):
+        return " AND ".join(f"({c.condition(params)})" for c in self.children)
+
+    def prepare(self, scan):
+        for child in self.children:
+            child.prepare(scan)
+        # Most selective first: cheap postings lists by size, then row filters, then
+        # component range scans, then negations; each later child only checks what's left
+        self.children.sort(key=lambda c: (c.rank, c.estimate))
+        self.rank = max(c.rank for c in self.children)
+        self.estimate = min(c.estimate for c in self.children)
+
+    def blocks(self, scan):
+        result = None
+        for child in self.children:
+            found = child.blocks(scan)
+            if found is not None:
+                result = found if result is None else result & found
+        return result
+
+    def evaluate(self, scan, candidates):
+        for child in self.children:
+            candidates = child.evaluate(scan, candidates)
+            if not candidates:
+                return set()
+        return candidates
+
+class Or:
+    rank = 0
+
+    def __init__(self, children):
+        self.children = children
+        self.estimate = 0
+
+    def describe(self):
+        return " OR ".join(wrap(c, And) for c in self.children)
+
+    def condition(self, params):
+        return " OR ".join(f"({c.condition(params)})" for c in self.children)
+
+    def prepare(self, scan):
+        for child in self.children:
+            child.prepare(scan)
+        self.children.sort(key=lambda c: (c.rank, c.estimate))
+        self.rank = max(c.rank for c in self.children)
+        self.estimate = sum(c.estimate for c in self.children)
+
+    def blocks(self, scan):
+        result = set()
+        for child in self.children:
+            found = child.blocks(scan)
+            if found is None:
+                return None
+            result |= found
+        return result
+
+    def evaluate(self, scan, candidates):
+        found = set()
+        for child in self.children:
+            # Later alternatives only need to look at what the earlier ones didn't match
+            rest = None if candidates is None else candidates - found
+            if rest is not None and not rest:
+                break
+            found |= child.evaluate(scan, rest)
+        return found
+
+class Not:
+    rank = 3
+
+    def __init__(self, child):
+        self.child = child
+        self.estimate = 0
+
+    def describe(self):
+        return "NOT " + wrap(self.child, And, Or)
+
+    def condition(self, params):
+        return f"NOT ({self.child.condition(params)})"
+
+    def prepare(self, scan):
+        self.child.prepare(scan)
+        self.estimate = scan.rows
+
+    def blocks(self, scan):
+        return None
+
+    def evaluate(self, scan, candidates):
+        base = scan.universe() if candidates is None else candidates
+        return base - self.child.evaluate(scan, base)
+
+def wrap(node, *kinds):
+    text = node.describe()
+    inner = node.node if isinstance(node, RowFilter) else node
+    return f"({text})" if isinstance(inner, kinds) else text
+
+def row_only(node):
+    """Whether a subtree only looks at records columns, so it can be one SQL condition."""
+    if isinstance(node, (Field, RowFilter)):
+        return True
+    if isinstance(node, Not):
+        return row_only(node.child)
+    if isinstance(node, (And, Or)):
+        return all(row_only(c) for c in node.children)
+    return False
+
+class RowFilter:
+    """A subtree of Fields (with any AND / OR / NOT) evaluated as one SQL condition."""
+
+    rank = 1
+
+    def __init__(self, node):
+        self.node = node
+        self.estimate = 0
+
+    def describe(self):
+        return self.node.describe()
+
+    def condition(self, params):
+        return self.node.condition(params)
+
+    def prepare(self, scan):
+        self.estimate = scan.rows
+        if isinstance(self.node, Field) and self.node.name == "prime":
+            self.estimate = scan.primes if self.node.low else scan.rows - scan.primes
+
+    def blocks(self, scan):
+        return self.node.blocks(scan)
+
+    def evaluate(self, scan, candidates):
+        params = []
+        return scan.select("records", self.condition(params), params, "", candidates)
+
+def simplify(node):
+    """Flattens nested AND / OR, removes double negation, and turns every records-only
+    subtree into a single RowFilter."""
+    if isinstance(node, Not):
+        child = simplify(node.child)
+        if isinstance(child, Not):
+            return child.child
+        node = Not(child)
+    elif isinstance(node, (And, Or)):
+        children = []
+        for child in map(simplify, node.children):
+            children.extend(child.children if type(child) is type(node) else [child])
+        if isinstance(node, And) and any(isinstance(c, Comp) for c in children):
+            # Any component already rules out primes
+            children = [c for c in children if not is_composite_filter(c)]
+        node = type(node)(children) if len(children) > 1 else children[0]
+    if not isinstance(node, RowFilter) and row_only(node):
+        return RowFilter(node)
+    return node
+
+def is_composite_filter(node):
+    node = node.node if isinstance(node, RowFilter) else node
+    return isinstance(node, Field) and node.name == "prime" and node.low == 0
+
+# ---------------------------------------------------------
+# Execution
+# ---------------------------------------------------------
+
+class Scan:
+    """One pass over [lo, hi], a postings block at a time, for a query or a whole batch.
+    Holds the per-block window and the segments decoded for it."""
+
+    def __init__(self, conn, lo, hi):
+        self.conn = conn
+        self.lo, self.hi = lo, hi
+        last_block = conn.execute("SELECT MAX(block) FROM rollup_blocks").fetchone()[0] or 0
+        self.block_lo, self.block_hi = lo // POSTINGS_BLOCK, min(hi // POSTINGS_BLOCK, last_block)
+        self.rows, self.primes = conn.execute("""SELECT COALESCE(SUM(rows), 0), COALESCE(SUM(primes), 0)
+                                                 FROM rollup_blocks WHERE block BETWEEN ? AND ?""",
+                                              (self.block_lo, self.block_hi)).fetchone()
+        self.decoded = 0
+        self.window = None
+        self.segments = {}
+        self.selected = {}
+
+    def postings_count(self, key):
+        return self.conn.execute("""SELECT COALESCE(SUM(count), 0) FROM postings
+                                    WHERE sig = ? AND block BETWEEN ? AND ?""",
+                                 (key, self.block_lo, self.block_hi)).fetchone()[0]
+
+    def postings_blocks(self, key):
+        return {b for b, in self.conn.execute("SELECT block FROM postings WHERE sig = ? AND block BETWEEN ? AND ?",
+                                              (key, self.block_lo, self.block_hi))}
+
+    def block_span(self, low, high):
+        first = self.block_lo if low is None else max(self.block_lo, low // POSTINGS_BLOCK)
+        last = self.block_hi if high is None else min(self.block_hi, high // POSTINGS_BLOCK)
+        return set(range(first, last + 1))
+
+    def w_blocks(self, low, high):
+        """Blocks whose rollups say they can hold a w in [low, high] (primes have w = 0)."""
+        params = [self.block_lo, self.block_hi]
+        overlap = between("w_max", low, None, params) + " AND " + between("w_min", None, high, params)
+        prime_ok = (low is None or low <= 0) and (high is None or high >= 0)
+        return {b for b, in self.conn.execute(f"""SELECT block FROM rollup_blocks WHERE block BETWEEN ? AND ?
+                                                  AND (({overlap}){' OR primes > 0' if prime_ok else ''})""", params)}
+
+    def all_blocks(self):
+        return {b for b, in self.conn.execute("SELECT block FROM rollup_blocks WHERE block BETWEEN ? AND ?",
+                                              (self.block_lo, self.block_hi))}
+
+    def enter(self, block):
+        self.block = block
+        self.window = (max(self.lo, block * POSTINGS_BLOCK), min(self.hi, (block + 1) * POSTINGS_BLOCK - 1))
+        self.segments = {}
+        self.selected = {}
+
+    def segment(self, key):
+        if key not in self.segments:
+            row = self.conn.execute("SELECT data FROM postings WHERE sig = ? AND block = ?", (key, self.block)).fetchone()
+            ns = decode_postings(row[0], self.block * POSTINGS_BLOCK) if row else []
+            self.decoded += len(ns)
+            self.segments[key] = set(ns)
+        return self.segments[key]
+
+    def universe(self):
+        if None not in self.segments:
+            self.segments[None] = {n for n, in self.conn.execute("SELECT n FROM records WHERE n BETWEEN ? AND ?", self.window)}
+            self.decoded += len(self.segments[None])
+        return self.segments[None]
+
+    def flags(self, conditions):
+        """Every records row in the window in n order, as (n, whether it satisfies each
+        (where, params) condition), from a single read of the window. Rows are read as
+        they're iterated, so the caller can stop early."""
+        columns = ", ".join(f"({where})" for where, _ in conditions)
+        params = [p for _, where_params in conditions for p in where_params]
+        for row in self.conn.execute(f"SELECT n, {columns} FROM records WHERE n BETWEEN ? AND ? ORDER BY n",
+                                     params + list(self.window)):
+            self.decoded += 1
+            yield row
+
+    def select(self, table, where, params, group, candidates):
+        """The n of table rows in the window (or among the candidates, when there are few)
+        that satisfy where. Whole-window results are kept for the block, so the same
+        condition in several queries of a batch is read once."""
+        key = (table, where, tuple(params), group)
+        found = self.selected.get(key)
+        if found is None:
+            if candidates is not None and len(candidates) <= PROBE_MAX:
+                sql = f"SELECT n FROM {table} WHERE n IN (SELECT value FROM json_each(?)) AND ({where}){group}"
+                found = {n for n, in self.conn.execute(sql, [json.dumps(sorted(candidates))] + params)}
+                self.decoded += len(found)
+                return candidates & found
+            sql = f"SELECT n FROM {table} WHERE n BETWEEN ? AND ? AND ({where}){group}"
+            found = self.selected[key] = {n for n, in self.conn.execute(sql, list(self.window) + params)}
+            self.decoded += len(found)
+        return found if candidates is None else candidates & found
+
+class Query:
+    """A compiled search: the query box expression plus the req_complete / hide_primes
+    checkboxes. Queries made only of row fields (or nothing) run as one SQL scan of records
+    (`where`); anything with components is evaluated a postings block at a time (`page`)."""
+
+    def __init__(self, query_str, req_complete=False, hide_primes=False):
+        node = Parser(query_str).parse()
+        conjuncts = [] if node is None else [node]
+        if req_complete:
+            conjuncts.append(Comp("C", None))
+        if hide_primes:
+            conjuncts.append(Field("prime", 0, 0))
+        self.root = None if not conjuncts else simplify(And(conjuncts) if len(conjuncts) > 1 else conjuncts[0])
+
+    @property
+    def row_only(self):
+        return self.root is None or isinstance(self.root, RowFilter)
+
+    def describe(self):
+        return "" if self.root is None else self.root.describe()
+
+    def where(self):
+        """(sql, params) for the records-only case; "1=1" for an empty query."""
+        if self.root is None:
+            return "1=1", []
+        params = []
+        return self.root.condition(params), params
+
+    def key(self):
+        """The postings list that is the whole answer, if the query is a single component."""
+        return self.root.postings_key() if isinstance(self.root, Comp) else None
+
+    def bounds(self, lo, hi):
+        """[lo, hi] narrowed by top-level n conditions."""
+        if self.root is None:
+            return lo, hi
+        conjuncts = self.root.node.children if isinstance(self.root, RowFilter) and isinstance(self.root.node, And) \
+            else self.root.children if isinstance(self.root, And) else [self.root]
+        for c in conjuncts:
+            node = c.node if isinstance(c, RowFilter) else c
+            if isinstance(node, Field) and node.name == "n":
+                lo = lo if node.low is None else max(lo, node.low)
+                hi = hi if node.high is None else min(hi, node.high)
+        return lo, hi
+
+    def page(self, conn, lo, hi, limit, offset):
+        """(n in [lo, hi] matching the query in order, skipping offset and stopping at limit
+        (negative: no limit), entries decoded / rows read to find them, the ordered plan)."""
+        if self.root is None:
+            return [], 0, self.describe()
+        pages, decoded = batch_pages(conn, [(self, lo, hi, limit, offset)])
+        return pages[0], decoded, self.explain()
+
+    def explain(self):
+        """The prepared plan: children in evaluation order with their estimates."""
+        def show(node):
+            if isinstance(node, (And, Or)):
+                sep = " AND " if isinstance(node, And) else " OR "
+                return "(" + sep.join(show(c) for c in node.children) + ")"
+            if isinstance(node, Not):
+                return "NOT " + show(node.child)
+            return f"{node.describe()} [~{node.estimate}]"
+        return "" if self.root is None else show(self.root)
+
+# ---------------------------------------------------------
+# Batches
+# ---------------------------------------------------------
+
+class Job:
+    """One search of a batch: its query, its range narrowed by the query's own n bounds, and
+    the page collected so far."""
+
+    def __init__(self, query, lo, hi, limit, offset):
+        self.query = query
+        self.lo, self.hi = query.bounds(lo, hi)
+        self.limit = limit
+        self.skip = max(offset, 0)
+        self.page = []
+        self.blocks = set()
+
+    @property
+    def done(self):
+        return self.lo > self.hi or len(self.page) == self.limit
+
+    def take(self, ns):
+        """Adds the next matches (in n order) after whatever offset is left to skip."""
+        ns = [n for n in ns if self.lo <= n <= self.hi]
+        if self.skip >= len(ns):
+            self.skip -= len(ns)
+            return
+        # A negative limit means no limit, as in Query.page
+        self.page.extend(ns[self.skip:] if self.limit < 0 else ns[self.skip:self.skip + self.limit - len(self.page)])
+        self.skip = 0
+
+def batch_pages(conn, searches):
+    """Query.page for several (query, lo, hi, limit, offset) at once, in one pass over the
+    union of their ranges. Each block is entered once and every search still short of its
+    limit is evaluated there, so the postings segments and records window it decodes are
+    shared, and the records-only searches are all checked by one read of the block's rows.
+    Returns the pages and the entries decoded / rows read to find them."""
+    jobs = [Job(*search) for search in searches]
+    live = [job for job in jobs if not job.done]
+    if not live:
+        return [job.page for job in jobs], 0
+    scan = Scan(conn, min(job.lo for job in live), max(job.hi for job in live))
+    existing = scan.all_blocks()
+    for job in live:
+        job.blocks = scan.block_span(job.lo, job.hi) & existing
+        if job.query.root is not None:
+            job.query.root.prepare(scan)
+            found = job.query.root.blocks(scan)
+            if found is not None:
+                job.blocks &= found
+    row_jobs = [job for job in live if job.query.row_only]
+    conditions = [job.query.where() for job in row_jobs]
+
+    for block in sorted(set().union(*(job.blocks for job in live))):
+        if all(job.done for job in live):
+            break
+        if not any(block in job.blocks and not job.done for job in live):
+            continue
+        scan.enter(block)
+        wanted = [i for i, job in enumerate(row_jobs) if block in job.blocks and not job.done]
+        if wanted:
+            columns = [(column, row_jobs[i]) for column, i in enumerate(wanted, 1)]
+            for row in scan.flags([conditions[i] for i in wanted]):
+                filled = False
+                for column, job in columns:
+                    if row[column]:
+                        job.take((row[0],))
+                        filled = filled or job.done
+                if filled:
+                    # Stop reading the block once every records-only search has its page
+                    columns = [(column, job) for column, job in columns if not job.done]
+                    if not columns:
+                        break
+        for job in live:
+            if not job.query.row_only and block in job.blocks and not job.done:
+                job.take(sorted(job.query.root.evaluate(scan, None)))
+    return [job.page for job in jobs], scan.decoded
+
+def batch_counts(conn, searches):
+    """Number of matches for several (query, lo, hi). The records-only searches are counted
+    together by one aggregate scan of records; the rest share one batch_pages pass."""
+    counts = [None] * len(searches)
+    rows = [(i, query, *query.bounds(lo, hi)) for i, (query, lo, hi) in enumerate(searches) if query.row_only]
+    if rows:
+        columns, params = [], []
+        for _, query, lo, hi in rows:
+            where, where_params = query.where()
+            columns.append(f"COALESCE(SUM(n BETWEEN ? AND ? AND ({where})), 0)")
+            params += [lo, hi, *where_params]
+        params += [min(row[2] for row in rows), max(row[3] for row in rows)]
+        totals = conn.execute(f"SELECT {', '.join(columns)} FROM records WHERE n BETWEEN ? AND ?", params).fetchone()
+        for (i, *_), total in zip(rows, totals):
+            counts[i] = total
+    rest = [i for i, count in enumerate(counts) if count is None]
+    pages, _ = batch_pages(conn, [(searches[i][0], searches[i][1], searches[i][2], -1, 0) for i in rest])
+    for i, page in zip(rest, pages):
+        counts[i] = len(page)
+    return counts
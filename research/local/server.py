@@ -1,11 +1,57 @@
-from flask import Flask, jsonify, request, render_template_string
+from flask import Flask, jsonify, request, render_template_string, Response, g
 import sqlite3
 import re
 import json
+import hashlib
+import importlib
 import os
+import threading
+import time
+import gzip
+import zlib
+import csv
+import io
+import sys
+import argparse
+import cProfile
+import pstats
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from generator import (factor_set, is_prime, graph_descriptors, factorize, compute_n,
+                       decode_postings, POSTINGS_BLOCK)
+from query import Query, QueryError, is_composite_filter, batch_pages, batch_counts
 
 app = Flask(__name__)
 DB_NAME = "graph_data.db"
+MAX_GRAPH_EDGES = 2_000_000  # Bigger graphs are never built (a browser can't draw them anyway)
+GRAPH_CACHE_EDGES = 8_000_000  # Total edges held by the rendered-graph LRU cache
+MAX_N = 1 << 62  # Upper bound for searches without a max
+POOL_SIZE = 8  # Open read-only connections shared by the request threads
+MMAP_SIZE = 1 << 30  # Bytes of the database each connection maps into memory
+PAGE_CACHE_KB = 65536  # Page cache per connection
+RESULT_CACHE_ENTRIES = 2048  # Search responses kept until MAX(n) moves
+DATA_VERSION_TTL = 1.0  # Seconds between MAX(n) checks for cache invalidation
+GZIP_MIN_BYTES = 1024  # Smaller responses aren't worth compressing
+GZIP_LEVEL = 6
+EXPORT_CHUNK = 5000  # Rows per keyset page when streaming an export
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)  # Seconds
+SLOW_QUERY_SECONDS = 0.1  # Searches slower than this are logged with their query plan
+SLOW_QUERY_LOG = 50  # Most recent slow queries kept for /api/health
+ALLOW_PROFILING = True  # ?profile=true answers with a cProfile report of the request instead
+PROFILE_LINES = 40
+STATUS_STALE_SECONDS = 60  # A "running" generator status this old means the run died
+PORT = 47274
+WORKER_TIMEOUT = 120  # --workers: seconds a silent worker gets before it's restarted
+GRACEFUL_TIMEOUT = 30  # --workers: seconds in-flight requests get on reload / shutdown
+WARM_SEARCH = "/api/search?q=&limit=50&hide_primes=true&req_complete=false"  # The page's first request
+LIVE_BATCH = 200  # Rows per pushed "rows" event
+LIVE_HEARTBEAT_SECONDS = 15  # Comment lines keep idle event streams from timing out
+LIVE_STREAM_SECONDS = 300  # Streams end after this and the browser reconnects where it left off
+LIVE_RETRY_MS = 2000  # Reconnect delay suggested to the browser
+LIVE_MAX_STREAMS = POOL_SIZE // 2  # Open /api/live streams per process; each holds a request thread for its lifetime
+BATCH_MAX_QUERIES = 500  # Searches per /api/search/batch request
+COMPUTE_MAX_N = 10 ** 20  # /api/compute/<n> bound: Pollard's rho splits any n below this in well under a second
 
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -185,7 +231,7 @@ HTML_TEMPLATE = """
 
         <div class="filter-container">
             <div class="filter-row">
-                <input type="text" id="searchInput" class="search-box" placeholder="Search Components: 6, (3, , (1,2)..." onkeyup="handleEnter(event)">
+                <input type="text" id="searchInput" class="search-box" placeholder="Search Components: 6, (3, , (1,2)..." title="Terms: 6 = C_{6}, (3,4) = K_{3,4}, (3, = any K with a 3, 4..10 and (2..4,6..) for size ranges, 2x(1,2) for at least two, w > 100, count >= 3, n < 5000, prime, complete. Combine with , / AND, OR, NOT and ( )." onkeyup="handleEnter(event)">
                 <input type="number" id="minN" class="num-input" placeholder="Min N">
                 <input type="number" id="maxN" class="num-input" placeholder="Max N">
                 <button class="btn" onclick="resetAndSearch()">Search</button>
@@ -218,13 +264,17 @@ HTML_TEMPLATE = """
     </div>
 
     <script>
-        let offset = 0;
+        let searchUrl = '';
+        let cursor = null;
         let limit = 50;
         let isLoading = false;
         let hasMore = true;
+        let liveSource = null;
+        let liveRows = false;
+        let generatorRunning = false;
+        let lastShownN = null;
         
         document.addEventListener('DOMContentLoaded', () => {
-            updateStats();
             resetAndSearch();
             
             const observer = new IntersectionObserver((entries) => {
@@ -246,66 +296,127 @@ HTML_TEMPLATE = """
 
         async function updateStats() {
             try {
-                const res = await fetch('/api/stats');
-                const data = await res.json();
-                document.getElementById('maxNDisplay').innerText = "Database Max N: " + data.max_n;
+                const [stats, gen] = await Promise.all([
+                    fetch('/api/stats').then(res => res.json()),
+                    fetch('/api/generator').then(res => res.json())
+                ]);
+                let text = "Database Max N: " + stats.max_n;
+                const status = gen.status;
+                const running = Boolean(status && status.state === 'running' && !status.stale);
+                if (running !== generatorRunning) {
+                    generatorRunning = running;
+                    openLive(liveRows);
+                }
+                if (running) {
+                    text += ` (generating, ${Math.round(status.rows_per_sec).toLocaleString()} rows/s`;
+                    if (status.eta_seconds !== null) text += `, ETA ${formatDuration(status.eta_seconds)}`;
+                    text += ')';
+                }
+                document.getElementById('maxNDisplay').innerText = text;
             } catch(e) { console.error(e); }
         }
 
+        function openLive(withRows) {
+            // Server-Sent Events: "stats" whenever Max N moves and, once the results have been
+            // scrolled to the end, "rows" with new matches past the last row shown. Each stream
+            // holds a server thread, so there is only one while a generator is writing
+            liveRows = withRows;
+            if (liveSource) liveSource.close();
+            liveSource = null;
+            if (!window.EventSource || !generatorRunning) return;
+            let url = '/api/live';
+            if (withRows) url = searchUrl.replace('/api/search', '/api/live') + `&after=${lastShownN === null ? 0 : lastShownN}`;
+            liveSource = new EventSource(url);
+            liveSource.addEventListener('stats', updateStats);
+            // Closed for good (the run ended, or the server has no stream to spare): recheck the generator
+            liveSource.addEventListener('error', () => {
+                if (liveSource && liveSource.readyState === EventSource.CLOSED) updateStats();
+            });
+            if (withRows) {
+                liveSource.addEventListener('rows', (e) => {
+                    JSON.parse(e.data).results
+                        .filter(row => lastShownN === null || row.n > lastShownN)
+                        .forEach(appendRow);
+                });
+            }
+        }
+
+        function formatDuration(seconds) {
+            const s = Math.round(seconds);
+            const h = Math.floor(s / 3600), m = Math.floor(s / 60) % 60;
+            return h ? `${h}h ${m}m` : m ? `${m}m ${s % 60}s` : `${s}s`;
+        }
+
         function resetAndSearch() {
-            offset = 0;
+            // The search is fixed when it starts; scrolling pages through it with the returned cursor
+            const query = document.getElementById('searchInput').value;
+            const minN = document.getElementById('minN').value;
+            const maxN = document.getElementById('maxN').value;
+            const hidePrimes = document.getElementById('hidePrimes').checked;
+            const requireComplete = document.getElementById('requireComplete').checked;
+
+            searchUrl = `/api/search?q=${encodeURIComponent(query)}&limit=${limit}`;
+            if(minN) searchUrl += `&min=${minN}`;
+            if(maxN) searchUrl += `&max=${maxN}`;
+            searchUrl += `&hide_primes=${hidePrimes}`;
+            searchUrl += `&req_complete=${requireComplete}`;
+
+            cursor = null;
             hasMore = true;
+            lastShownN = null;
             document.querySelector('#resultsTable tbody').innerHTML = '';
             document.getElementById('network').style.display = 'none';
+            openLive(false);
+            updateStats();
             performSearch(true);
         }
 
+        function appendRow(row) {
+            const tr = document.createElement('tr');
+            const graphBtn = row.has_graph 
+                ? `<button class="btn btn-small" onclick='drawGraph(${row.n})'>Graph</button>` 
+                : '<span style="color:gray; font-size:0.9em;">Too Large</span>';
+
+            tr.innerHTML = `
+                <td><strong>${row.n}</strong></td>
+                <td style="word-break: break-all;">${row.components}</td>
+                <td>${row.w}</td>
+                <td>${graphBtn}</td>
+            `;
+            document.querySelector('#resultsTable tbody').appendChild(tr);
+            lastShownN = row.n;
+        }
+
         async function performSearch(isReset) {
             if (isLoading || (!hasMore && !isReset)) return;
             isLoading = true;
             document.getElementById('loadingTrigger').innerText = "Loading...";
 
-            const query = document.getElementById('searchInput').value;
-            const minN = document.getElementById('minN').value;
-            const maxN = document.getElementById('maxN').value;
-            const hidePrimes = document.getElementById('hidePrimes').checked;
-            const requireComplete = document.getElementById('requireComplete').checked;
-
-            let url = `/api/search?q=${encodeURIComponent(query)}&offset=${offset}&limit=${limit}`;
-            if(minN) url += `&min=${minN}`;
-            if(maxN) url += `&max=${maxN}`;
-            url += `&hide_primes=${hidePrimes}`;
-            url += `&req_complete=${requireComplete}`;
+            let url = searchUrl;
+            if(cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
 
             try {
                 const response = await fetch(url);
                 const data = await response.json();
+                if (!response.ok) {
+                    // A query that doesn't parse: show why instead of results
+                    hasMore = false;
+                    document.getElementById('loadingTrigger').innerText = data.error;
+                    return;
+                }
                 
-                if (data.results.length < limit) {
+                if (!data.next_cursor) {
                     hasMore = false;
                     document.getElementById('loadingTrigger').innerText = "End of results";
                 } else {
                     document.getElementById('loadingTrigger').innerText = "Scroll for more";
                 }
 
-                const tbody = document.querySelector('#resultsTable tbody');
-                
-                data.results.forEach(row => {
-                    const tr = document.createElement('tr');
-                    const graphBtn = row.has_graph 
-                        ? `<button class="btn btn-small" onclick='drawGraph(${row.n})'>Graph</button>` 
-                        : '<span style="color:gray; font-size:0.9em;">Too Large</span>';
-
-                    tr.innerHTML = `
-                        <td><strong>${row.n}</strong></td>
-                        <td style="word-break: break-all;">${row.components}</td>
-                        <td>${row.w}</td>
-                        <td>${graphBtn}</td>
-                    `;
-                    tbody.appendChild(tr);
-                });
+                data.results.forEach(appendRow);
 
-                offset += limit;
+                cursor = data.next_cursor;
+                // Past the end, new matches arrive over the live stream instead
+                if (!cursor) openLive(true);
             } catch (err) {
                 console.error(err);
             } finally {
@@ -406,34 +517,578 @@ HTML_TEMPLATE = """
 </html>
 """
 
-def get_db():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
+class ConnectionPool:
+    """Read-only, memory-mapped connections to the database, reused across requests.
+    Each connection keeps its prepared statements (sqlite3's statement cache), so the
+    fixed queries are only compiled once per connection."""
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self.idle = []  # Most recently returned last, so warm page caches get reused first
+        self.slots = threading.Semaphore(size)
+        self.lock = threading.Lock()
+        self.opened = self.checkouts = self.waits = self.errors = 0
+        self.wait_seconds = 0.0
+
+    def open(self):
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True,
+                               check_same_thread=False, cached_statements=64)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = -{PAGE_CACHE_KB}")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        if not self.slots.acquire(blocking=False):
+            start = time.perf_counter()
+            self.slots.acquire()
+            with self.lock:
+                self.waits += 1
+                self.wait_seconds += time.perf_counter() - start
+        try:
+            with self.lock:
+                self.checkouts += 1
+                conn = self.idle.pop() if self.idle else None
+            if conn is None:
+                conn = self.open()
+                with self.lock:
+                    self.opened += 1
+            failed = False
+            try:
+                yield conn
+            except sqlite3.Error:
+                failed = True
+                raise
+            finally:
+                with self.lock:
+                    if failed:
+                        # Don't hand a connection that just failed to the next request
+                        self.errors += 1
+                        self.opened -= 1
+                    else:
+                        self.idle.append(conn)
+                if failed:
+                    conn.close()
+        finally:
+            self.slots.release()
+
+    def warm(self):
+        """Opens every connection up front so the first requests don't pay for it."""
+        with self.lock:
+            missing = self.size - self.opened
+            self.opened += missing
+        for _ in range(missing):
+            try:
+                conn = self.open()
+                conn.execute("SELECT MAX(n) FROM records").fetchone()
+            except sqlite3.Error:
+                with self.lock:
+                    self.opened -= 1
+                raise
+            with self.lock:
+                self.idle.append(conn)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": self.size,
+                "open": self.opened,
+                "idle": len(self.idle),
+                "in_use": self.opened - len(self.idle),
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_seconds": round(self.wait_seconds, 6),
+                "errors": self.errors,
+            }
+
+db_pool = ConnectionPool(DB_NAME, POOL_SIZE)
+
+# ---------------------------------------------------------
+# Response caching: encoded payloads, ETags and compression
+# ---------------------------------------------------------
+
+def encode_payload(body):
+    """(raw, gzipped) bytes of a response body; gzipped is None for small bodies."""
+    raw = body.encode() if isinstance(body, str) else body
+    return raw, gzip.compress(raw, GZIP_LEVEL) if len(raw) >= GZIP_MIN_BYTES else None
+
+def cached_response(payload, etag, last_modified=None, mimetype='application/json'):
+    """Response for an encoded payload, gzipped if the client accepts it, or a 304 if the
+    client's copy is current. Each encoding gets its own ETag."""
+    raw, gzipped = payload
+    use_gzip = gzipped is not None and 'gzip' in request.headers.get('Accept-Encoding', '')
+    resp = Response(gzipped if use_gzip else raw, mimetype=mimetype)
+    if use_gzip:
+        resp.headers['Content-Encoding'] = 'gzip'
+        etag += '-gz'
+    resp.headers['Vary'] = 'Accept-Encoding'
+    resp.set_etag(etag)
+    if last_modified is not None:
+        resp.last_modified = last_modified
+    resp.cache_control.no_cache = True  # Always revalidate; a 304 is cheap
+    return resp.make_conditional(request)
+
+class DataVersion:
+    """MAX(n) of the database, re-read at most every DATA_VERSION_TTL seconds, and the
+    time it was first seen at its current value."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.max_n = None
+        self.changed = time.time()
+        self.checked = 0.0
+        self.lock = threading.Lock()
+
+    def current(self):
+        with self.lock:
+            if time.monotonic() - self.checked < self.ttl:
+                return self.max_n, self.changed
+        with db_pool.connection() as conn:
+            max_n = conn.execute("SELECT MAX(n) FROM records").fetchone()[0] or 0
+        with self.lock:
+            self.checked = time.monotonic()
+            if max_n != self.max_n:
+                self.max_n = max_n
+                self.changed = time.time()
+            return self.max_n, self.changed
+
+data_version = DataVersion(DATA_VERSION_TTL)
+
+class ResultCache:
+    """LRU cache of encoded search responses keyed by the normalized query. Everything is
+    dropped when the data version (MAX(n)) moves, since new rows can change any page."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> payload, oldest first
+        self.version = None
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.invalidations = 0
+
+    def get(self, version, key):
+        with self.lock:
+            if version != self.version:
+                if self.entries:
+                    self.invalidations += 1
+                self.entries.clear()
+                self.version = version
+            payload = self.entries.get(key)
+            if payload is None:
+                self.misses += 1
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            return payload
+
+    def put(self, version, key, payload):
+        with self.lock:
+            if version != self.version:
+                return
+            self.entries[key] = payload
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+result_cache = ResultCache(RESULT_CACHE_ENTRIES)
+
+def cached_json(key, build):
+    """JSON response for a normalized request key. Identical requests against the same
+    data are served from the result cache; build() runs only on a miss."""
+    version, changed = data_version.current()
+    etag = f"{version}-{hashlib.sha1(key.encode()).hexdigest()[:16]}"
+    payload = result_cache.get(version, key)
+    if payload is None:
+        payload = encode_payload(json.dumps(build(), separators=(",", ":")))
+        result_cache.put(version, key, payload)
+    return cached_response(payload, etag, changed)
+
+# The page has no per-request content, so it is rendered and compressed once
+with app.app_context():
+    INDEX_PAGE = encode_payload(render_template_string(HTML_TEMPLATE))
+INDEX_ETAG = hashlib.sha1(INDEX_PAGE[0]).hexdigest()[:16]
 
 @app.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE)
+    return cached_response(INDEX_PAGE, INDEX_ETAG, mimetype='text/html')
 
 @app.route('/api/stats')
 def stats():
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT MAX(n) as max_n FROM records")
-    row = cur.fetchone()
-    conn.close()
-    return jsonify({"max_n": row['max_n'] if row and row['max_n'] else 0})
+    max_n, _ = data_version.current()
+    return jsonify({"max_n": max_n})
+
+@app.route('/api/generator')
+def generator_status():
+    """Progress of the latest generator run on this database (its generator_status row),
+    or {"status": null} for databases written before the table existed."""
+    resp = jsonify({"status": read_generator_status()})
+    resp.cache_control.no_store = True
+    return resp
+
+def generator_running():
+    """Whether a generator run is writing to the database right now."""
+    status = read_generator_status()
+    return status is not None and status['state'] == 'running' and not status['stale']
+
+def read_generator_status():
+    """The generator_status row with its age, staleness and percent done, or None."""
+    with db_pool.connection() as conn:
+        has_table = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'generator_status'").fetchone()
+        row = conn.execute("SELECT * FROM generator_status WHERE id = 1").fetchone() if has_table else None
+    status = None
+    if row is not None:
+        status = {key: row[key] for key in row.keys() if key != 'id'}
+        status['stages'] = json.loads(status['stages'] or '{}')
+        age = time.time() - status['updated']
+        status['age_seconds'] = round(age, 1)
+        # A run killed without a chance to write its final status stays "running"
+        status['stale'] = status['state'] == 'running' and age > STATUS_STALE_SECONDS
+        if status['target_n'] is not None and status['target_n'] > status['start_n']:
+            done = (status['current_n'] - status['start_n'] + 1) / (status['target_n'] - status['start_n'])
+            status['percent'] = round(min(max(done, 0.0), 1.0) * 100, 2)
+    return status
+
+def stream_graph(n, descriptors):
+    """Yields the vis.js {"nodes": [...], "edges": [...]} JSON for n piece by piece.
+    descriptors are the generator's compact ["C", a] / ["K", a, b] entries, one per component."""
+    # The vertex set for divisor a is factor_set(n, a): the m < n with gcd(m, n) == a.
+    # Since every m appears in only ONE set, the numbers themselves are unique IDs,
+    # and in the K_xy case set_a and set_b are disjoint.
+    groups = []
+    for group_id, d in enumerate(descriptors):
+        set_a = factor_set(n, d[1])
+        set_b = factor_set(n, d[2]) if d[0] == "K" else None
+        groups.append((group_id, set_a, set_b))
+
+    yield '{"nodes": ['
+    sep = ""
+    for group_id, set_a, set_b in groups:
+        for val in set_a + (set_b or []):
+            yield f'{sep}{{"id": {val}, "label": "{val}", "group": {group_id}}}'
+            sep = ", "
+
+    yield '], "edges": ['
+    sep = ""
+    for group_id, set_a, set_b in groups:
+        if set_b is None:
+            # Complete graph on set_a
+            for i, u in enumerate(set_a):
+                if i + 1 < len(set_a):
+                    yield sep + ", ".join(f'{{"from": {u}, "to": {v}}}' for v in set_a[i + 1:])
+                    sep = ", "
+        else:
+            # Complete Bipartite between set_a and set_b
+            for u in set_a:
+                yield sep + ", ".join(f'{{"from": {u}, "to": {v}}}' for v in set_b)
+                sep = ", "
+    yield ']}'
+
+class GraphCache:
+    """LRU cache of rendered graph JSON, bounded by the total number of edges it holds.
+    Concurrent requests for the same n wait for the first one instead of rebuilding it."""
+
+    def __init__(self, max_edges):
+        self.max_edges = max_edges
+        self.edges = 0
+        self.entries = OrderedDict()  # n -> (payload, edges), oldest first
+        self.in_flight = {}  # n -> threading.Event set when its build finishes
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.coalesced = 0
+
+    def get(self, n, edges, build):
+        with self.lock:
+            if n in self.entries:
+                self.entries.move_to_end(n)
+                self.hits += 1
+                return self.entries[n][0]
+            event = self.in_flight.get(n)
+            leader = event is None
+            if leader:
+                event = self.in_flight[n] = threading.Event()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            event.wait()
+            with self.lock:
+                entry = self.entries.get(n)
+            # Only missing if the leader failed or it was evicted in the meantime
+            return entry[0] if entry else build()
+
+        try:
+            payload = build()
+            with self.lock:
+                self.entries[n] = (payload, edges)
+                self.edges += edges
+                while self.edges > self.max_edges and len(self.entries) > 1:
+                    _, (_, evicted_edges) = self.entries.popitem(last=False)
+                    self.edges -= evicted_edges
+            return payload
+        finally:
+            with self.lock:
+                del self.in_flight[n]
+            event.set()
+
+graph_cache = GraphCache(GRAPH_CACHE_EDGES)
+
+COMPONENT_RE = re.compile(r"([CK])_\{(\d+)(?:,(\d+))?\}")
+
+def edge_count(components_str):
+    """Edges in the graph described by a components_str: x*y per K_{x,y}, m(m-1)/2 per C_{m}."""
+    total = 0
+    for kind, low, high in COMPONENT_RE.findall(components_str or ""):
+        low = int(low)
+        total += low * int(high) if kind == "K" else low * (low - 1) // 2
+    return total
+
+def graph_info(n):
+    """Returns (descriptors, edges) for any composite n, from the database if it has the row
+    and computed from n's factorization otherwise. Returns None for primes and n < 4."""
+    with db_pool.connection() as conn:
+        row = conn.execute("SELECT components_str, graph_data, is_prime FROM records WHERE n = ?", (n,)).fetchone()
+
+    if row is not None:
+        if row['is_prime']:
+            return None
+        edges = edge_count(row['components_str'])
+        g_data = json.loads(row['graph_data']) if row['graph_data'] else None
+        if isinstance(g_data, (list, dict)) and g_data:
+            return g_data, edges
+    elif n < 4:
+        return None
+    else:
+        edges = None
+
+    # Every composite n has a component with roughly phi(n)/2 or more edges, so anything
+    # this large is over MAX_GRAPH_EDGES; don't spend a sieve on factoring it
+    if n > MAX_GRAPH_EDGES * 32:
+        return [], MAX_GRAPH_EDGES + 1
+    factorization = factorize(n)
+    if is_prime(factorization):
+        return None
+    if edges is None:
+        (_, components_str, _, _, _), _ = compute_n(n)
+        edges = edge_count(components_str)
+    return graph_descriptors(n, factorization), edges
+
+# ---------------------------------------------------------
+# Instrumentation: request metrics, slow queries, profiling
+# ---------------------------------------------------------
+
+class Metrics:
+    """Request counts, latency histograms and search row counters, rendered for /metrics
+    in the Prometheus text format together with the pool and cache stats."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.requests = {}  # (endpoint, method, status) -> count
+        self.latency = {}  # endpoint -> [count per bucket..., sum, count]
+        self.rows = {}  # source -> [scanned, returned]
+        self.slow_queries = 0
+        self.slow_log = deque(maxlen=SLOW_QUERY_LOG)
+        self.lock = threading.Lock()
+
+    def observe_request(self, endpoint, method, status, seconds):
+        with self.lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            hist = self.latency.setdefault(endpoint, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    hist[i] += 1
+                    break
+            hist[-2] += seconds
+            hist[-1] += 1
+
+    def count_rows(self, source, scanned, returned):
+        with self.lock:
+            counts = self.rows.setdefault(source, [0, 0])
+            counts[0] += scanned
+            counts[1] += returned
+
+    def slow_query(self, entry):
+        with self.lock:
+            self.slow_queries += 1
+            self.slow_log.append(entry)
+
+    def render(self):
+        lines = []
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{name}{{{label_str}}} {value}" if label_str else f"{name} {value}")
+
+        with self.lock:
+            metric("zn_http_requests_total", "counter", "Requests by endpoint, method and status.",
+                   [((("endpoint", e), ("method", m), ("status", s)), count)
+                    for (e, m, s), count in sorted(self.requests.items())])
+            metric("zn_http_request_duration_seconds", "histogram",
+                   "Time to build each response (streamed exports: until the first byte).", [])
+            for endpoint, hist in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, hist):
+                    cumulative += count
+                    lines.append(f'zn_http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+                lines.append(f'zn_http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {hist[-1]}')
+                lines.append(f'zn_http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {hist[-2]:.6f}')
+                lines.append(f'zn_http_request_duration_seconds_count{{endpoint="{endpoint}"}} {hist[-1]}')
+            metric("zn_search_rows_scanned_total", "counter",
+                   "Postings entries decoded / records rows walked to answer searches.",
+                   [((("source", src),), counts[0]) for src, counts in sorted(self.rows.items())])
+            metric("zn_search_rows_returned_total", "counter", "Rows those searches returned.",
+                   [((("source", src),), counts[1]) for src, counts in sorted(self.rows.items())])
+            metric("zn_slow_queries_total", "counter", f"Searches slower than {SLOW_QUERY_SECONDS}s.",
+                   [((), self.slow_queries)])
+
+        pool = db_pool.stats()
+        for key in ("size", "open", "idle", "in_use"):
+            metric(f"zn_db_pool_{key}", "gauge", f"Connection pool: {key.replace('_', ' ')}.", [((), pool[key])])
+        for key in ("checkouts", "waits", "wait_seconds", "errors"):
+            metric(f"zn_db_pool_{key}_total", "counter", f"Connection pool: {key.replace('_', ' ')}.", [((), pool[key])])
+        for key in ("hits", "misses", "invalidations"):
+            metric(f"zn_result_cache_{key}_total", "counter", f"Search result cache {key}.",
+                   [((), getattr(result_cache, key))])
+        metric("zn_result_cache_entries", "gauge", "Responses in the search result cache.",
+               [((), len(result_cache.entries))])
+        for key in ("hits", "misses", "coalesced"):
+            metric(f"zn_graph_cache_{key}_total", "counter", f"Graph cache {key}.", [((), getattr(graph_cache, key))])
+        metric("zn_graph_cache_entries", "gauge", "Graphs in the graph cache.", [((), len(graph_cache.entries))])
+        metric("zn_graph_cache_edges", "gauge", "Edges held by the graph cache.", [((), graph_cache.edges)])
+        metric("zn_data_max_n", "gauge", "Largest n in the database.", [((), data_version.max_n or 0)])
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics(LATENCY_BUCKETS)
+
+def log_slow_query(conn, sql, params, seconds, query, steps):
+    """Logs a slow search with the plan SQLite chose for it (and the order the query's
+    predicates were evaluated in, with their estimates) and keeps it for /api/health."""
+    plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+    shown = [p if len(str(p)) <= 200 else str(p)[:200] + "..." for p in params]
+    entry = {
+        "time": time.time(),
+        "seconds": round(seconds, 6),
+        "query": query.describe(),
+        "steps": steps,
+        "sql": " ".join(sql.split()),
+        "params": shown,
+        "plan": plan,
+    }
+    metrics.slow_query(entry)
+    app.logger.warning("Slow query (%.3fs): %s params=%s query=%s steps=%s plan=%s",
+                       seconds, entry["sql"], shown, entry["query"], steps, " | ".join(plan))
+
+@app.before_request
+def start_request():
+    g.request_start = time.perf_counter()
+    if ALLOW_PROFILING and request.args.get('profile') == 'true':
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def finish_request(resp):
+    elapsed = time.perf_counter() - g.request_start
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(PROFILE_LINES)
+        resp = Response(report.getvalue(), mimetype='text/plain')
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.observe_request(endpoint, request.method, resp.status_code, elapsed)
+    resp.headers['Server-Timing'] = f"app;dur={elapsed * 1000:.2f}"
+    return resp
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/health')
+def health():
+    return jsonify({
+        "pool": db_pool.stats(),
+        "result_cache": {
+            "hits": result_cache.hits,
+            "misses": result_cache.misses,
+            "invalidations": result_cache.invalidations,
+            "entries": len(result_cache.entries),
+            "version": result_cache.version,
+        },
+        "graph_cache": {
+            "hits": graph_cache.hits,
+            "misses": graph_cache.misses,
+            "coalesced": graph_cache.coalesced,
+            "entries": len(graph_cache.entries),
+            "edges": graph_cache.edges,
+        },
+        "slow_queries": list(metrics.slow_log),
+    })
+
+def not_modified(etag):
+    """A 304 if the client already holds etag (in either encoding), otherwise None."""
+    for tag in (etag, etag + '-gz'):
+        if request.if_none_match.contains(tag):
+            resp = Response(status=304)
+            resp.set_etag(tag)
+            return resp
+    return None
 
 @app.route('/api/graph/<int:n>')
 def get_graph(n):
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT graph_data FROM records WHERE n = ?", (n,))
-    row = cur.fetchone()
-    conn.close()
-    if row and row['graph_data']:
-        return jsonify(json.loads(row['graph_data']))
-    return jsonify({})
+    # The graph of n never changes, so a client holding it can skip the lookup entirely
+    etag = f"graph-{n}"
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    info = graph_info(n)
+    if info is None:
+        return jsonify({})
+    g_data, edges = info
+    if isinstance(g_data, dict):
+        # Full node/edge JSON from databases generated before the compact format
+        return jsonify(g_data)
+    if edges > MAX_GRAPH_EDGES:
+        return jsonify({})
+    payload = graph_cache.get(n, edges, lambda: encode_payload("".join(stream_graph(n, g_data))))
+    return cached_response(payload, etag)
+
+@app.route('/api/compute/<int:n>')
+def compute(n):
+    """The search row for any n, generated or not, computed from its factorization."""
+    if not 2 <= n <= COMPUTE_MAX_N:
+        return jsonify({"error": f"n must be between 2 and {COMPUTE_MAX_N}."}), 400
+    # Like a graph, the row of n never changes
+    etag = f"compute-{n}"
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    (_, components_str, w, _, _), _ = compute_n(n)
+    row = {
+        "n": n,
+        "components": components_str,
+        "w": w,
+        "has_graph": bool(components_str) and edge_count(components_str) <= MAX_GRAPH_EDGES,
+        "factorization": factorize(n),
+    }
+    return cached_response(encode_payload(json.dumps(row, separators=(",", ":"))), etag)
+
+def parse_range(min_n, max_n):
+    """(lo, hi) for a search's min / max arguments, either of which may be empty (open).
+    Raises QueryError unless they're whole numbers no bigger than MAX_N."""
+    if (min_n and not min_n.isdecimal()) or (max_n and not max_n.isdecimal()):
+        raise QueryError("min and max must be whole numbers.")
+    lo, hi = (int(min_n) if min_n else 0), (int(max_n) if max_n else MAX_N)
+    if lo > MAX_N or hi > MAX_N:
+        # SQLite integers stop at 2^63 - 1
+        raise QueryError(f"min and max must be at most {MAX_N}.")
+    return lo, hi
+
+def search_fingerprint(query_str, min_n, max_n, hide_primes, req_complete):
+    """Short hash of the search a cursor was issued for."""
+    key = json.dumps([query_str, min_n, max_n, hide_primes, req_complete])
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
 
 @app.route('/api/search')
 def search():
@@ -445,92 +1100,627 @@ def search():
     
     limit = request.args.get('limit', default=50, type=int)
     offset = request.args.get('offset', default=0, type=int)
+    try:
+        lo, hi = parse_range(min_n, max_n)
+        query = Query(query_str, req_complete, hide_primes)
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
 
-    conn = get_db()
-    cur = conn.cursor()
-
-    sql_clauses = []
-    params = []
+    # A cursor from the previous page replaces the offset: the next page seeks past its last n
+    fingerprint = search_fingerprint(query_str, min_n, max_n, hide_primes, req_complete)
+    after = None
+    cursor = request.args.get('cursor', '').strip()
+    if cursor:
+        last_n, _, cursor_fingerprint = cursor.partition('.')
+        if cursor_fingerprint != fingerprint or not last_n.isdigit():
+            return jsonify({"error": "Cursor does not belong to this search."}), 400
+        after = int(last_n)
+        offset = 0
 
-    # Range Filters
-    if min_n:
-        sql_clauses.append("n >= ?")
-        params.append(int(min_n))
-    if max_n:
-        sql_clauses.append("n <= ?")
-        params.append(int(max_n))
+    key = json.dumps(["search", query_str, min_n, max_n, hide_primes, req_complete, limit, offset, after])
+    return cached_json(key, lambda: run_search(query, lo, hi, limit, offset, after, fingerprint))
 
-    # Prime Filter
-    if hide_primes:
-        sql_clauses.append("is_prime = 0")
+def fetch_page(conn, query, lo, hi, after, limit, offset, columns=("n", "components_str", "w")):
+    """One page of the records in [lo, hi] (from parse_range) matching a compiled Query, in n
+    order, starting after n = after (keyset) or skipping offset rows."""
+    start = time.perf_counter()
+    if after is not None:
+        lo = max(lo, after + 1)
 
-    # Complete Component Filter (Any C_m)
-    if req_complete:
-        sql_clauses.append("components_str LIKE '%C_{%'")
+    steps = None
+    if query.row_only:
+        # Only records columns (or nothing) to check: one scan of records, seeking on n
+        where, params = query.where()
+        sql = f"""
+            SELECT {', '.join(columns)}
+            FROM records
+            WHERE n >= ? AND n <= ? AND ({where})
+            ORDER BY n ASC
+            LIMIT ? OFFSET ?
+        """
+        params = [lo, hi, *params, limit, offset]
+    else:
+        # Components: the query is evaluated a postings block at a time, then the page of
+        # matching n is read from records
+        ns, decoded = [], 0
+        if limit != 0:
+            ns, decoded, steps = query.page(conn, lo, hi, limit, offset)
+        metrics.count_rows("postings", decoded, len(ns))
+        sql = f"""
+            SELECT {', '.join('r.' + col for col in columns)}
+            FROM json_each(?) AS m
+            CROSS JOIN records r ON r.n = m.value
+            ORDER BY r.n ASC
+        """
+        params = [json.dumps(ns)]
 
-    # Text Filters
-    if query_str:
-        parts = [p.strip() for p in query_str.split('),')] 
-        comp_clauses = []
-        
-        for part in parts:
-            part = part.replace(')', '').strip()
-            
-            # Exact Complete Component: "6" -> C_{6}
-            if re.match(r'^\d+$', part):
-                comp_clauses.append(f"components_str LIKE ?")
-                params.append(f"%C_{{{part}}}%")
-            
-            # Partial K: "(6,"
-            elif '(' in part and ',' in part and (part.endswith(',') or part.startswith(',')):
-                nums = re.findall(r'\d+', part)
-                if nums:
-                    val = nums[0]
-                    sub_sql = "(components_str LIKE ? OR components_str LIKE ?)"
-                    comp_clauses.append(sub_sql)
-                    params.append(f"%K_{{{val},%")
-                    params.append(f"%,{val}}}%")
-
-            # Full K: "(3,4)"
-            elif '(' in part and ',' in part:
-                nums = re.findall(r'\d+', part)
-                if len(nums) >= 2:
-                    n1, n2 = int(nums[0]), int(nums[1])
-                    low, high = sorted([n1, n2])
-                    comp_clauses.append("components_str LIKE ?")
-                    params.append(f"%K_{{{low},{high}}}%")
-        
-        if comp_clauses:
-            sql_clauses.append(" AND ".join(comp_clauses))
+    rows = conn.execute(sql, params).fetchall()
+    if query.row_only:
+        # The scan walks every n from the lower bound to the last row returned (skipped offset
+        # rows and filtered ones included); n is dense, so that span is the rows it read
+        scanned = rows[-1][0] - max(lo, 4) + 1 if rows else max(offset, 0)
+        metrics.count_rows("records", scanned, len(rows))
+    seconds = time.perf_counter() - start
+    if seconds >= SLOW_QUERY_SECONDS:
+        log_slow_query(conn, sql, params, seconds, query, steps)
+    return rows
 
-    where_clause = " AND ".join(sql_clauses) if sql_clauses else "1=1"
-    
-    sql = f"""
-        SELECT n, components_str, w, graph_data 
-        FROM records 
-        WHERE {where_clause} 
-        ORDER BY n ASC 
-        LIMIT ? OFFSET ?
-    """
-    params.append(limit)
-    params.append(offset)
-    
-    cur.execute(sql, params)
-    results = cur.fetchall()
-    conn.close()
+def run_search(query, lo, hi, limit, offset, after, fingerprint):
+    with db_pool.connection() as conn:
+        results = fetch_page(conn, query, lo, hi, after, limit, offset)
+    return search_response(results, limit, fingerprint)
 
+def search_response(results, limit, fingerprint):
+    """The /api/search body for a page of (n, components_str, w) rows."""
     rows = []
     for r in results:
         rows.append({
             "n": r['n'],
             "components": r['components_str'],
             "w": r['w'],
-            "has_graph": r['graph_data'] != 'null' and r['graph_data'] is not None
+            # Any composite can be drawn; graphs past the database's threshold are computed on demand
+            "has_graph": bool(r['components_str']) and edge_count(r['components_str']) <= MAX_GRAPH_EDGES
         })
 
-    return jsonify({"results": rows})
+    # Only a full page can have more after it
+    next_cursor = f"{rows[-1]['n']}.{fingerprint}" if rows and len(rows) == limit else None
+    return {"results": rows, "next_cursor": next_cursor}
+
+def batch_entry(entry, limit, offset):
+    """The search a /api/search/batch entry asks for (a q string, or an object with the
+    /api/search arguments) as (query, lo, hi, limit, offset, fingerprint). Raises QueryError
+    for anything malformed."""
+    if isinstance(entry, str):
+        entry = {"q": entry}
+    if not isinstance(entry, dict):
+        raise QueryError("Each query must be a string or an object.")
+    query_str = str(entry.get('q') or '').strip()
+    min_n = str(entry.get('min') or '').strip()
+    max_n = str(entry.get('max') or '').strip()
+    hide_primes = entry.get('hide_primes') in (True, 'true')
+    req_complete = entry.get('req_complete') in (True, 'true')
+    limit = entry.get('limit', limit)
+    offset = entry.get('offset', offset)
+    if not isinstance(limit, int) or not isinstance(offset, int):
+        raise QueryError("limit and offset must be whole numbers.")
+    lo, hi = parse_range(min_n, max_n)
+    query = Query(query_str, req_complete, hide_primes)
+
+    fingerprint = search_fingerprint(query_str, min_n, max_n, hide_primes, req_complete)
+    cursor = str(entry.get('cursor') or '').strip()
+    if cursor:
+        last_n, _, cursor_fingerprint = cursor.partition('.')
+        if cursor_fingerprint != fingerprint or not last_n.isdigit():
+            raise QueryError("Cursor does not belong to this search.")
+        lo = max(lo, int(last_n) + 1)
+        offset = 0
+    return query, lo, hi, limit, offset, fingerprint
+
+@app.route('/api/search/batch', methods=['POST'])
+def search_batch():
+    """Many searches in one request, e.g. {"queries": ["6", {"q": "(3,4)", "max": 100000}]}.
+    Entries take the /api/search arguments (limit and offset default to the top-level ones),
+    and with "count": true each answer is its /api/stats/count instead of a page. All of them
+    are evaluated in one shared pass over their n ranges. A malformed entry gets an "error"
+    in its place without failing the rest."""
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(body.get('queries'), list):
+        return jsonify({"error": 'Expected a JSON object with a "queries" list.'}), 400
+    entries = body['queries']
+    if len(entries) > BATCH_MAX_QUERIES:
+        return jsonify({"error": f"At most {BATCH_MAX_QUERIES} queries per batch."}), 400
+    counting = body.get('count') in (True, 'true')
+    limit = body.get('limit', 50)
+    offset = body.get('offset', 0)
+
+    searches = []
+    for entry in entries:
+        try:
+            searches.append(batch_entry(entry, limit, offset))
+        except QueryError as e:
+            searches.append(str(e))
+
+    def build():
+        answers = [{"error": s} if isinstance(s, str) else None for s in searches]
+        valid = [i for i, s in enumerate(searches) if not isinstance(s, str)]
+        with db_pool.connection() as conn:
+            if counting:
+                rest = []
+                for i in valid:
+                    query, lo, hi = searches[i][:3]
+                    count = quick_count(conn, query, lo, hi)
+                    if count is None:
+                        rest.append(i)
+                    else:
+                        answers[i] = {"count": count}
+                counts = batch_counts(conn, [searches[i][:3] for i in rest])
+                for i, count in zip(rest, counts):
+                    answers[i] = {"count": count}
+                return {"results": answers}
+
+            pages, decoded = batch_pages(conn, [searches[i][:5] for i in valid])
+            # Every page's rows come out of records in one lookup
+            wanted = sorted(set().union(*pages))
+            rows = {r['n']: r for r in conn.execute("""SELECT r.n, r.components_str, r.w
+                                                        FROM json_each(?) AS m
+                                                        CROSS JOIN records r ON r.n = m.value""",
+                                                     [json.dumps(wanted)])}
+        metrics.count_rows("batch", decoded, sum(map(len, pages)))
+        for i, page in zip(valid, pages):
+            answers[i] = search_response([rows[n] for n in page], searches[i][3], searches[i][5])
+        return {"results": answers}
+
+    key = json.dumps(["batch", entries, counting, limit, offset])
+    return cached_json(key, build)
+
+# ---------------------------------------------------------
+# Bulk export
+# ---------------------------------------------------------
+
+def ndjson_lines(rows, with_graph):
+    # components_str only ever holds [CK_{},0-9 ], so it needs no JSON escaping
+    if with_graph:
+        return "".join(f'{{"n":{r[0]},"components":"{r[1]}","w":{r[2]},"is_prime":{r[3]},"graph_data":{r[4] or "null"}}}\n'
+                       for r in rows)
+    return "".join(f'{{"n":{r[0]},"components":"{r[1]}","w":{r[2]},"is_prime":{r[3]}}}\n' for r in rows)
+
+def csv_lines(rows, header=None):
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    if header:
+        writer.writerow(header)
+    writer.writerows(rows)
+    return out.getvalue()
+
+@app.route('/api/export')
+def export():
+    """Streams every record matching the search filters (q, min, max, hide_primes, req_complete)
+    as NDJSON, or CSV with format=csv. graph=true adds graph_data. The rows are read in keyset
+    pages of EXPORT_CHUNK, so memory stays flat and no read lock is held between pages."""
+    query_str = request.args.get('q', '').strip()
+    min_n = request.args.get('min', '').strip()
+    max_n = request.args.get('max', '').strip()
+    hide_primes = request.args.get('hide_primes', 'false') == 'true'
+    req_complete = request.args.get('req_complete', 'false') == 'true'
+    fmt = request.args.get('format', 'ndjson')
+    with_graph = request.args.get('graph', 'false') == 'true'
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({"error": "format must be ndjson or csv."}), 400
+    # Everything that can reject the request runs here: once the Response exists the 200 and
+    # its headers are already on their way, and an error in chunks() only cuts the body short
+    try:
+        lo, hi = parse_range(min_n, max_n)
+        query = Query(query_str, req_complete, hide_primes)
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
+    use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+
+    columns = ("n", "components_str", "w", "is_prime") + (("graph_data",) if with_graph else ())
+    header = ("n", "components", "w", "is_prime") + (("graph_data",) if with_graph else ())
+
+    def chunks():
+        after = None
+        first = True
+        while True:
+            with db_pool.connection() as conn:
+                rows = fetch_page(conn, query, lo, hi, after, EXPORT_CHUNK, 0, columns)
+            if fmt == 'csv':
+                yield csv_lines(rows, header if first else None)
+            elif rows:
+                yield ndjson_lines(rows, with_graph)
+            first = False
+            if len(rows) < EXPORT_CHUNK:
+                return
+            after = rows[-1][0]
+
+    def encoded():
+        if not use_gzip:
+            for text in chunks():
+                yield text.encode()
+            return
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+        for text in chunks():
+            # Sync-flush each page so the client gets rows as they are produced
+            yield compressor.compress(text.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+    resp = Response(encoded(), mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson')
+    resp.headers['Content-Disposition'] = f'attachment; filename=export.{fmt}'
+    resp.headers['Vary'] = 'Accept-Encoding'
+    if use_gzip:
+        resp.headers['Content-Encoding'] = 'gzip'
+    return resp
+
+# ---------------------------------------------------------
+# Live updates: Server-Sent Events while the generator writes
+# ---------------------------------------------------------
+
+class LiveFeed:
+    """Watches MAX(n) from one background thread and wakes every open /api/live stream
+    when it moves, so the database is polled once per process, not once per client."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.max_n = None
+        self.changed = threading.Condition()
+        self.thread = None
+
+    def run(self):
+        while True:
+            try:
+                max_n, _ = data_version.current()
+            except sqlite3.Error:
+                max_n = self.max_n
+            with self.changed:
+                if max_n != self.max_n:
+                    self.max_n = max_n
+                    self.changed.notify_all()
+            time.sleep(self.interval)
+
+    def wait(self, seen, timeout):
+        """MAX(n) once it differs from seen, or the unchanged value after timeout seconds."""
+        with self.changed:
+            if self.thread is None:
+                # Started on first use, so each pre-forked worker runs its own
+                self.thread = threading.Thread(target=self.run, name="live-feed", daemon=True)
+                self.thread.start()
+            self.changed.wait_for(lambda: self.max_n is not None and self.max_n != seen, timeout)
+            return self.max_n
+
+live_feed = LiveFeed(DATA_VERSION_TTL)
+live_slots = threading.BoundedSemaphore(LIVE_MAX_STREAMS)
+
+def sse(event, data, event_id=None):
+    lines = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{lines}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+@app.route('/api/live')
+def live():
+    """Event stream of "stats" ({"max_n"}) whenever new rows are committed. Given after=N plus
+    the search parameters, also "rows" events ({"results"} as in /api/search) with every new
+    match past N, in order; each carries its last n as the event id, so a reconnecting
+    EventSource (Last-Event-ID) resumes exactly where it stopped.
+
+    Streams are only served while a generator is running (otherwise 204, which tells
+    EventSource not to reconnect) and end once it stops. Each one holds a request thread, so a
+    process serves at most LIVE_MAX_STREAMS at once and answers 503 past that."""
+    query_str = request.args.get('q', '').strip()
+    min_n = request.args.get('min', '').strip()
+    max_n = request.args.get('max', '').strip()
+    hide_primes = request.args.get('hide_primes', 'false') == 'true'
+    req_complete = request.args.get('req_complete', 'false') == 'true'
+    after = request.args.get('after', type=int)
+    last_event = request.headers.get('Last-Event-ID', '')
+    if after is not None and last_event.isdigit():
+        after = max(after, int(last_event))
+    fingerprint = search_fingerprint(query_str, min_n, max_n, hide_primes, req_complete)
+    query = None
+    if after is not None:
+        try:
+            lo, hi = parse_range(min_n, max_n)
+            query = Query(query_str, req_complete, hide_primes)
+        except QueryError as e:
+            return jsonify({"error": str(e)}), 400
+    if not generator_running():
+        return Response(status=204)
+    if not live_slots.acquire(blocking=False):
+        resp = jsonify({"error": "Too many live streams open on this server."})
+        resp.status_code = 503
+        resp.headers['Retry-After'] = str(LIVE_STREAM_SECONDS)
+        return resp
+
+    def events():
+        nonlocal after
+        yield f"retry: {LIVE_RETRY_MS}\n\n"
+        seen = None
+        deadline = time.monotonic() + LIVE_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            current = live_feed.wait(seen, LIVE_HEARTBEAT_SECONDS)
+            if current == seen:
+                if not generator_running():
+                    # The run is over; the browser's reconnect gets a 204 and stops there
+                    return
+                yield ": keepalive\n\n"
+                continue
+            seen = current
+            yield sse("stats", {"max_n": current})
+            while after is not None:
+                page = run_search(query, lo, hi, LIVE_BATCH, 0, after, fingerprint)
+                if not page["results"]:
+                    break
+                after = page["results"][-1]["n"]
+                yield sse("rows", {"results": page["results"]}, after)
+                if len(page["results"]) < LIVE_BATCH:
+                    break
+
+    resp = Response(events(), mimetype='text/event-stream')
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'  # Don't let a proxy hold events back
+    resp.call_on_close(live_slots.release)
+    return resp
+
+# ---------------------------------------------------------
+# Analytics over n ranges, answered from the rollup tables
+# ---------------------------------------------------------
+# Whole blocks in the range come from the rollups (or the postings counts, per signature);
+# only the partial blocks at either end are read row by row.
+
+def analytics_range():
+    """The [lo, hi] of the request's min/max, and the rest of its arguments as a cache key.
+    Raises QueryError for a min or max that isn't a whole number."""
+    lo, hi = parse_range(request.args.get('min', '').strip(), request.args.get('max', '').strip())
+    key = json.dumps([request.path, sorted(request.args.items(multi=True))])
+    return lo, hi, key
+
+def split_range(lo, hi):
+    """Splits [lo, hi] into the (first, last) whole blocks it covers, None if there are none,
+    and the partial ranges left over at either end (each within a single block)."""
+    first = -(-lo // POSTINGS_BLOCK)
+    last = (hi + 1) // POSTINGS_BLOCK - 1
+    if first > last:
+        if lo > hi:
+            return None, []
+        # Both ends fall in the same block or in two neighbouring ones
+        split = (lo // POSTINGS_BLOCK + 1) * POSTINGS_BLOCK
+        return None, [(lo, hi)] if hi < split else [(lo, split - 1), (split, hi)]
+    edges = []
+    if lo < first * POSTINGS_BLOCK:
+        edges.append((lo, first * POSTINGS_BLOCK - 1))
+    if hi >= (last + 1) * POSTINGS_BLOCK:
+        edges.append(((last + 1) * POSTINGS_BLOCK, hi))
+    return (first, last), edges
+
+def range_summary(conn, lo, hi):
+    whole, edges = split_range(lo, hi)
+    parts = []
+    if whole:
+        parts.append(conn.execute("""SELECT SUM(rows), SUM(primes), MIN(w_min), MAX(w_max), SUM(w_sum), MAX(max_n)
+                                     FROM rollup_blocks WHERE block BETWEEN ? AND ?""", whole).fetchone())
+    for edge in edges:
+        parts.append(conn.execute("""SELECT COUNT(*), SUM(is_prime),
+                                            MIN(CASE WHEN is_prime = 0 THEN w END), MAX(CASE WHEN is_prime = 0 THEN w END),
+                                            SUM(CASE WHEN is_prime = 0 THEN w END), MAX(n)
+                                     FROM records WHERE n BETWEEN ? AND ?""", edge).fetchone())
+    rows = sum(p[0] or 0 for p in parts)
+    primes = sum(p[1] or 0 for p in parts)
+    w_mins = [p[2] for p in parts if p[2] is not None]
+    w_maxes = [p[3] for p in parts if p[3] is not None]
+    w_sum = sum(p[4] or 0 for p in parts)
+    max_ns = [p[5] for p in parts if p[5] is not None]
+    return {
+        "rows": rows,
+        "primes": primes,
+        "composites": rows - primes,
+        "w_min": min(w_mins) if w_mins else None,
+        "w_max": max(w_maxes) if w_maxes else None,
+        "w_sum": w_sum,
+        "w_mean": w_sum / (rows - primes) if rows > primes else None,
+        "max_n": max(max_ns) if max_ns else None,
+    }
+
+def signature_count(conn, sig, lo, hi):
+    """Number of n in [lo, hi] in the postings list of sig."""
+    whole, edges = split_range(lo, hi)
+    total = 0
+    if whole:
+        total += conn.execute("SELECT COALESCE(SUM(count), 0) FROM postings WHERE sig = ? AND block BETWEEN ? AND ?",
+                              (sig, *whole)).fetchone()[0]
+    for edge_lo, edge_hi in edges:
+        block = edge_lo // POSTINGS_BLOCK
+        row = conn.execute("SELECT data FROM postings WHERE sig = ? AND block = ?", (sig, block)).fetchone()
+        if row:
+            total += sum(1 for n in decode_postings(row[0], block * POSTINGS_BLOCK) if edge_lo <= n <= edge_hi)
+    return total
+
+def quick_count(conn, query, lo, hi):
+    """Number of n in [lo, hi] matching a search when the rollups or a single postings list
+    already hold it, otherwise None."""
+    if query.root is None or is_composite_filter(query.root):
+        summary = range_summary(conn, lo, hi)
+        return summary["rows"] if query.root is None else summary["composites"]
+    if query.key() is not None:
+        return signature_count(conn, query.key(), lo, hi)
+    return None
+
+@app.route('/api/stats/summary')
+def stats_summary():
+    try:
+        lo, hi, key = analytics_range()
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
+    def build():
+        with db_pool.connection() as conn:
+            return range_summary(conn, lo, hi)
+    return cached_json(key, build)
+
+@app.route('/api/stats/count')
+def stats_count():
+    """Number of n in the range matching a search (same q/req_complete/hide_primes syntax)."""
+    try:
+        lo, hi, key = analytics_range()
+        query = Query(request.args.get('q', '').strip(),
+                      request.args.get('req_complete', 'false') == 'true',
+                      request.args.get('hide_primes', 'false') == 'true')
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def build():
+        with db_pool.connection() as conn:
+            count = quick_count(conn, query, lo, hi)
+            if count is None:
+                count = batch_counts(conn, [(query, lo, hi)])[0]
+        return {"count": count}
+    return cached_json(key, build)
+
+@app.route('/api/stats/histogram')
+def stats_histogram():
+    """field=w: composites by number of digits of w. field=n: rows, primes and w_sum per
+    bucket of n (bucket is rounded up to a multiple of the rollup block)."""
+    try:
+        lo, hi, key = analytics_range()
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
+    field = request.args.get('field', 'w')
+    if field not in ('w', 'n'):
+        return jsonify({"error": "field must be w or n."}), 400
+    bucket = request.args.get('bucket', default=POSTINGS_BLOCK, type=int)
+    bucket = max(1, -(-bucket // POSTINGS_BLOCK)) * POSTINGS_BLOCK
+
+    def build():
+        whole, edges = split_range(lo, hi)
+        counts = {}
+        with db_pool.connection() as conn:
+            if field == 'n':
+                if whole:
+                    rows = conn.execute("""SELECT block * ?1 / ?2, SUM(rows), SUM(primes), SUM(w_sum)
+                                           FROM rollup_blocks WHERE block BETWEEN ?3 AND ?4
+                                           GROUP BY block * ?1 / ?2""", (POSTINGS_BLOCK, bucket, *whole)).fetchall()
+                else:
+                    rows = []
+                for edge in edges:
+                    rows += conn.execute("""SELECT n / ?1, COUNT(*), SUM(is_prime), SUM(CASE WHEN is_prime = 0 THEN w ELSE 0 END)
+                                            FROM records WHERE n BETWEEN ?2 AND ?3 GROUP BY n / ?1""", (bucket, *edge)).fetchall()
+                for b, n_rows, primes, w_sum in rows:
+                    entry = counts.setdefault(b, [0, 0, 0])
+                    entry[0] += n_rows
+                    entry[1] += primes or 0
+                    entry[2] += w_sum or 0
+                return {"field": "n", "bucket": bucket, "buckets": [
+                    {"low": b * bucket, "high": (b + 1) * bucket - 1, "rows": r, "primes": p, "w_sum": w}
+                    for b, (r, p, w) in sorted(counts.items())]}
+
+            if whole:
+                rows = conn.execute("""SELECT digits, SUM(rows) FROM rollup_w
+                                       WHERE block BETWEEN ? AND ? GROUP BY digits""", whole).fetchall()
+            else:
+                rows = []
+            for edge in edges:
+                rows += conn.execute("""SELECT LENGTH(w), COUNT(*) FROM records
+                                        WHERE n BETWEEN ? AND ? AND is_prime = 0 GROUP BY LENGTH(w)""", edge).fetchall()
+            for digits, n_rows in rows:
+                counts[digits] = counts.get(digits, 0) + n_rows
+        return {"field": "w", "buckets": [
+            {"low": 10 ** (d - 1) if d > 1 else 0, "high": 10 ** d - 1, "rows": r}
+            for d, r in sorted(counts.items())]}
+    return cached_json(key, build)
+
+@app.route('/api/stats/facets')
+def stats_facets():
+    """The most common component signatures in the range (kind=C or K to restrict)."""
+    try:
+        lo, hi, key = analytics_range()
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
+    kind = request.args.get('kind', '').upper()
+    limit = request.args.get('limit', default=20, type=int)
+    pattern = f"{kind}%" if kind in ("C", "K") else "%"
+
+    def build():
+        whole, edges = split_range(lo, hi)
+        counts = {}
+        with db_pool.connection() as conn:
+            if whole:
+                for sig, count in conn.execute("""SELECT sig, SUM(count) FROM postings
+                                                  WHERE block BETWEEN ? AND ? AND sig LIKE ?
+                                                  AND sig NOT LIKE '%*%' GROUP BY sig""", (*whole, pattern)):
+                    counts[sig] = count
+            for edge_lo, edge_hi in edges:
+                block = edge_lo // POSTINGS_BLOCK
+                for sig, data in conn.execute("""SELECT sig, data FROM postings
+                                                 WHERE block = ? AND sig LIKE ? AND sig NOT LIKE '%*%'""",
+                                              (block, pattern)):
+                    count = sum(1 for n in decode_postings(data, block * POSTINGS_BLOCK) if edge_lo <= n <= edge_hi)
+                    if count:
+                        counts[sig] = counts.get(sig, 0) + count
+        top = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:max(limit, 0)]
+        return {"facets": [{"signature": sig, "count": count} for sig, count in top]}
+    return cached_json(key, build)
+
+# ---------------------------------------------------------
+# Serving
+# ---------------------------------------------------------
+
+def warm_up():
+    """Fills the connection pool and the caches behind the page's first requests."""
+    if not os.path.exists(DB_NAME):
+        return
+    try:
+        db_pool.warm()
+        data_version.current()
+        with app.test_request_context(WARM_SEARCH):
+            search()
+    except sqlite3.Error as e:
+        print(f"Skipping warm-up: {e}")
+
+def serve_prefork(host, port, workers):
+    """Runs the app under gunicorn: `workers` processes, each with POOL_SIZE threads and its
+    own warm connections and caches. SIGHUP replaces the workers gracefully (picking up code
+    changes), SIGTERM / Ctrl+C drains them and exits. Returns False if gunicorn isn't available."""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:  # Not installed, or Windows
+        return False
+    print(f"Serving with {workers} worker processes on http://{host}:{port}")
+
+    class PreforkServer(BaseApplication):
+        def load_config(self):
+            settings = {
+                "bind": f"{host}:{port}",
+                "workers": workers,
+                "worker_class": "gthread",
+                "threads": POOL_SIZE,
+                "timeout": WORKER_TIMEOUT,
+                "graceful_timeout": GRACEFUL_TIMEOUT,
+                # Each worker imports the app itself, so sqlite connections are never shared
+                # across a fork and a reload loads the current code
+                "preload_app": False,
+                "post_worker_init": lambda worker: importlib.import_module("server").warm_up(),
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # Not this module's app: the master imported server.py as __main__ before forking,
+            # so a fresh import in the worker is what reads the code as it is now
+            return importlib.import_module("server").app
+
+    PreforkServer().run()
+    return True
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the Z_n Graph Explorer.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=PORT, help=f"port to listen on (default: {PORT})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes; more than 1 runs under gunicorn (default: 1, Flask's threaded server)")
+    parser.add_argument("--debug", action="store_true", help="Flask debug mode (single process only)")
+    args = parser.parse_args()
+
     if not os.path.exists(DB_NAME):
         print("Database not found. Please run generator.py first.")
-    app.run(port=47274, debug=True, use_reloader=False, threaded=True)
+    if args.workers > 1 and not args.debug:
+        if serve_prefork(args.host, args.port, args.workers):
+            sys.exit()
+        print("gunicorn is not installed (pip install gunicorn); falling back to a single process.")
+    warm_up()
+    app.run(host=args.host, port=args.port, debug=args.debug, use_reloader=False, threaded=True)
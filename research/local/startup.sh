@@ -10,10 +10,15 @@ fi
 # Start the python server in the background
 # Using nohup to prevent it from closing immediately if terminal config is weird,
 # but standard backgrounding & works for this interactive session.
-python3 server.py > server.log 2>&1 &
+# WORKERS=4 ./startup.sh serves with 4 processes (needs gunicorn, otherwise it runs one)
+WORKERS=${WORKERS:-1}
+python3 server.py --workers "$WORKERS" > server.log 2>&1 &
 SERVER_PID=$!
 
 echo "Server started with PID $SERVER_PID on port 47274."
+if [ "$WORKERS" -gt 1 ]; then
+    echo "Running $WORKERS workers. Reload them without downtime with: kill -HUP $SERVER_PID"
+fi
 echo "Waiting 2 seconds for server boot..."
 sleep 2
 